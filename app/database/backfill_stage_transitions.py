@@ -0,0 +1,20 @@
+"""Rebuild the StageTransition table from the stage_id entries in ChangeHistory.
+
+Run once after `prisma db push` adds the table:
+
+    python -m app.database.backfill_stage_transitions
+"""
+import asyncio
+from app.database.prisma import prisma
+from app.services.stage_analytics import backfill_stage_transitions
+
+async def main():
+    await prisma.connect()
+    try:
+        count = await backfill_stage_transitions()
+        print(f"Stage transitions rebuilt: {count}")
+    finally:
+        await prisma.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())
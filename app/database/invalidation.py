@@ -0,0 +1,116 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from app.database.prisma import prisma
+from app.utils.constants import (
+    INVALIDATION_CHANNEL, INVALIDATION_HEARTBEAT_SECONDS, INVALIDATION_RECONNECT_SECONDS
+)
+
+try:
+    import asyncpg
+except ImportError:  # without it workers only see their own writes
+    asyncpg = None
+
+# Cross-worker cache invalidation. Writers evict their own caches directly and
+# publish() a NOTIFY; every worker keeps one LISTEN connection (Prisma's engine
+# can't deliver notifications, so it is a plain asyncpg connection) and runs
+# the handlers subscribed for the entity. Notifications sent before the
+# worker was listening (including between loading its caches at startup and
+# the first connect) are lost, so it evicts everything whenever LISTEN is
+# established.
+
+WORKER_ID = uuid.uuid4().hex
+# Query parameters understood by Prisma but rejected by asyncpg
+PRISMA_URL_PARAMS = {"schema", "connection_limit", "pool_timeout", "pgbouncer", "socket_timeout", "connect_timeout"}
+
+logger = logging.getLogger("app.invalidation")
+
+_handlers: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+_version = 0
+_listener: Optional[asyncio.Task] = None
+
+def subscribe(entity: str, handler: Callable[[Optional[str]], None]):
+    # handler(key) is called with the published key, or None for "everything"
+    _handlers.setdefault(entity, []).append(handler)
+
+def _dispatch(entity: str, key: Optional[str]):
+    for handler in _handlers.get(entity, []):
+        handler(key)
+
+def _dispatch_all():
+    for entity in _handlers:
+        _dispatch(entity, None)
+
+async def publish(entity: str, key=None):
+    global _version
+    _version += 1
+    payload = json.dumps({
+        "entity": entity,
+        "key": None if key is None else str(key),
+        "version": _version,  # per-origin sequence, for tracing
+        "origin": WORKER_ID,
+    })
+    try:
+        await prisma.execute_raw("SELECT pg_notify($1, $2)", INVALIDATION_CHANNEL, payload)
+    except Exception as e:
+        # The write itself is committed; other workers catch up when their
+        # cache entries expire
+        logger.warning("Could not publish %s invalidation: %s", entity, e)
+
+def _on_notify(connection, pid, channel, payload):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return
+    if message.get("origin") == WORKER_ID:
+        return
+    _dispatch(message.get("entity"), message.get("key"))
+
+def _listen_dsn() -> str:
+    parts = urlsplit(os.environ["DATABASE_URL"])
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in PRISMA_URL_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+async def _listen():
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(_listen_dsn())
+            await connection.add_listener(INVALIDATION_CHANNEL, _on_notify)
+            _dispatch_all()
+            while True:
+                await asyncio.sleep(INVALIDATION_HEARTBEAT_SECONDS)
+                await connection.fetchval("SELECT 1")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Invalidation listener disconnected: %s", e)
+        finally:
+            if connection is not None:
+                connection.terminate()
+        await asyncio.sleep(INVALIDATION_RECONNECT_SECONDS)
+
+def start_listener():
+    global _listener
+    if asyncpg is None:
+        logger.warning("asyncpg is not installed, caches are not invalidated across workers")
+        return
+    if "DATABASE_URL" not in os.environ:
+        logger.warning("DATABASE_URL is not set, caches are not invalidated across workers")
+        return
+    if _listener is None:
+        _listener = asyncio.create_task(_listen())
+
+async def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
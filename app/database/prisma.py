@@ -1,3 +1,24 @@
+import time
 from prisma import Prisma
+from app.utils.metrics import current_request_stats, metrics
 
-prisma = Prisma(auto_register=True)
\ No newline at end of file
+class InstrumentedPrisma(Prisma):
+    # Times every model and raw query and attributes it to the request being
+    # served. Transactions copy the client through self.__class__, so queries
+    # inside prisma.tx() are counted too; batch_() commits bypass _execute and
+    # are not.
+    async def _execute(self, *, method, arguments, model=None, root_selection=None):
+        start = time.perf_counter()
+        try:
+            return await super()._execute(
+                method=method, arguments=arguments, model=model, root_selection=root_selection
+            )
+        finally:
+            elapsed = time.perf_counter() - start
+            name = f"{model.__name__}.{method}" if model is not None else method
+            metrics.observe_query(name, elapsed)
+            stats = current_request_stats.get()
+            if stats is not None:
+                stats.record(name, elapsed)
+
+prisma = InstrumentedPrisma(auto_register=True)
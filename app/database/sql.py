@@ -0,0 +1,33 @@
+import json
+from typing import Any, Dict, List
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def escape_like(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class SqlParams:
+    # Collects positional parameters for prisma.query_raw and hands out
+    # their $n placeholders
+    def __init__(self):
+        self.values: List[Any] = []
+
+    def add(self, value: Any, cast: str = None) -> str:
+        self.values.append(value)
+        placeholder = f"${len(self.values)}"
+        return f"{placeholder}::{cast}" if cast else placeholder
+
+async def insert_returning(client, table: str, rows: List[Dict], returning: List[str], defaults: Dict[str, str] = None) -> List[Dict]:
+    # Bulk insert that, unlike create_many, hands back the inserted rows. The
+    # batch is one jsonb parameter typed by the table's own row type;
+    # defaults maps columns missing from the rows to SQL expressions
+    defaults = defaults or {}
+    columns = list(rows[0])
+    sql = (
+        f'INSERT INTO {quote_ident(table)} ({", ".join(quote_ident(c) for c in columns + list(defaults))}) '
+        f'SELECT {", ".join([quote_ident(c) for c in columns] + list(defaults.values()))} '
+        f'FROM jsonb_populate_recordset(NULL::{quote_ident(table)}, $1::jsonb) '
+        f'RETURNING {", ".join(quote_ident(c) for c in returning)}'
+    )
+    return await client.query_raw(sql, json.dumps(rows, default=str))
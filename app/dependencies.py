@@ -1,13 +1,25 @@
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import BaseModel
 from app.database.prisma import prisma
-from app.utils.constants import SECRET_KEY, ALGORITHM
+from app.database.invalidation import publish, subscribe
+from app.utils.cache import TTLCache
+from app.utils.constants import SECRET_KEY, ALGORITHM, USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# username -> User, so authenticated requests skip the user lookup
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+async def invalidate_user(username: str):
+    user_cache.pop(username)
+    await publish("user", username)
+
+subscribe("user", lambda username: user_cache.pop(username) if username else user_cache.clear())
+
 class TokenData(BaseModel):
     username: str | None = None
 
@@ -25,7 +37,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
+    cached = user_cache.get(token_data.username)
+    if cached is not None:
+        return cached
     user = await prisma.user.find_unique(where={"username": token_data.username})
     if user is None:
         raise credentials_exception
-    return User(**user.__dict__)
\ No newline at end of file
+    current_user = User(**user.__dict__)
+    # Never keep the user around longer than the token is valid
+    ttl = USER_CACHE_TTL_SECONDS
+    if payload.get("exp"):
+        ttl = min(ttl, payload["exp"] - time.time())
+    user_cache.set(token_data.username, current_user, ttl=ttl)
+    return current_user
\ No newline at end of file
@@ -1,8 +1,18 @@
-from fastapi import FastAPI
-from app.routers import auth, users, dictionaries, projects, revenues, costs, reports, dashboard
+import logging
+import time
+from fastapi import FastAPI, Request
+from app.routers import auth, users, dictionaries, projects, revenues, costs, reports, dashboard, imports, sync, metrics as metrics_router
 from app.database.prisma import prisma
-from app.utils.constants import DICT_TYPES
-from app.utils.dictionary_loader import load_dictionaries_from_file
+from app.database.invalidation import start_listener, stop_listener
+from app.utils.dictionary_loader import load_dictionaries_from_file, sync_dictionaries
+from app.services.dictionary_cache import dictionary_cache
+from app.services.export_service import shutdown_render_executor
+from app.services.auth_service import shutdown_password_executor
+from app.services.export_jobs import cleanup_expired_exports
+from app.utils.constants import SLOW_REQUEST_SECONDS
+from app.utils.metrics import RequestStats, current_request_stats, metrics
+
+logger = logging.getLogger("app.requests")
 
 app = FastAPI(title="Rostelecom Project Management API")
 
@@ -15,21 +25,53 @@ app.include_router(revenues.router)
 app.include_router(costs.router)
 app.include_router(reports.router)
 app.include_router(dashboard.router)
+app.include_router(imports.router)
+app.include_router(sync.router)
+app.include_router(metrics_router.router)
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    stats = RequestStats()
+    token = current_request_stats.set(stats)
+    metrics.in_progress += 1
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.in_progress -= 1
+        current_request_stats.reset(token)
+        # Label by route template so /projects/1 and /projects/2 share a series
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.observe_request(request.method, path, status, elapsed, stats)
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            logger.warning(
+                "Slow request %s %s: %d in %.0fms, %d queries %.0fms db [%s]",
+                request.method, request.url.path, status, elapsed * 1000,
+                stats.queries, stats.db_seconds * 1000, stats.summary()
+            )
 
 @app.on_event("startup")
 async def startup():
     await prisma.connect()
-    # Initialize dictionary types
-    for name in DICT_TYPES:
-        existing = await prisma.dictionarytype.find_unique(where={"name": name})
-        if not existing:
-            await prisma.dictionarytype.create(data={"name": name})
-    # Load dictionaries from file (assumes dict.json in project root)
+    # Seed dictionary types and items (assumes dict.json in project root)
     try:
-        await load_dictionaries_from_file("dict.json")
+        summary = await load_dictionaries_from_file("dict.json")
+        print(f"Dictionaries synced: {summary}")
     except Exception as e:
         print(f"Warning: Could not load dictionaries: {e}")
+        await sync_dictionaries({})
+    await dictionary_cache.load()
+    cleanup_expired_exports()
+    start_listener()
 
 @app.on_event("shutdown")
 async def shutdown():
-    await prisma.disconnect()
\ No newline at end of file
+    await stop_listener()
+    await prisma.disconnect()
+    shutdown_render_executor()
+    shutdown_password_executor()
\ No newline at end of file
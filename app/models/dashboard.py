@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+from typing import List
+
+class GanttQuery(BaseModel):
+    project_ids: List[int]
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class ImportRowError(BaseModel):
+    row: Optional[int]
+    error: str
+
+class ImportResult(BaseModel):
+    total: int
+    imported: int
+    error_count: int = 0
+    errors: List[ImportRowError]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class ProjectCreate(BaseModel):
@@ -67,4 +67,8 @@ class Project(BaseModel):
     updated_at: datetime
     status: Optional[str]
     done_in_period: Optional[str]
-    plans_next_period: Optional[str]
\ No newline at end of file
+    plans_next_period: Optional[str]
+
+class ProjectPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -1,6 +1,36 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import Any, List, Dict, Literal, Optional
+from datetime import date, datetime
 
 class ReportQuery(BaseModel):
     fields: List[str]
-    filters: Dict
\ No newline at end of file
+    filters: Dict
+
+class TimeSeriesQuery(BaseModel):
+    # start and end are inclusive; only their year and month are used
+    start: Optional[date] = None
+    end: Optional[date] = None
+    group_by: Optional[Literal["status", "business_segment", "service", "manager"]] = None
+    filters: Dict[str, Any] = {}
+
+class ForecastQuery(BaseModel):
+    start: Optional[date] = None
+    end: Optional[date] = None
+    # What-if probabilities by stage id, applied to every project in that stage
+    scenario: Dict[int, float] = {}
+
+class ExportRequest(BaseModel):
+    query: ReportQuery
+    format: Literal["xlsx", "pdf"]
+
+class ExportJob(BaseModel):
+    id: str
+    format: Literal["xlsx", "pdf"]
+    status: Literal["queued", "running", "done", "failed"] = "queued"
+    rows: int = 0
+    total: Optional[int] = None
+    progress: float = 0.0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
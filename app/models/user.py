@@ -6,6 +6,9 @@ class UserCreate(BaseModel):
     password: str
     role: str  # 'ADMIN', 'ANALYST', 'USER'
 
+class UserRoleUpdate(BaseModel):
+    role: str  # 'ADMIN', 'ANALYST', 'USER'
+
 class User(BaseModel):
     id: int
     username: str
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import List
 from app.models.dictionary import DictionaryTypeCreate, DictionaryType, DictionaryItemCreate, DictionaryItem
 from app.database.prisma import prisma
 from app.dependencies import get_current_user
 from app.models.user import User
+from app.services.dictionary_cache import dictionary_cache
+from app.services.data_version import data_changed
+from app.database.invalidation import publish
+from app.utils.etag import make_etag, etag_matches, not_modified
 
 router = APIRouter(prefix="/dictionaries", tags=["dictionaries"])
 
@@ -11,20 +15,28 @@ router = APIRouter(prefix="/dictionaries", tags=["dictionaries"])
 async def create_dictionary_type(type: DictionaryTypeCreate, current_user: User = Depends(get_current_user)):
     if current_user.role not in ["ADMIN"]:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return await prisma.dictionarytype.create(data=type.dict())
+    db_type = await prisma.dictionarytype.create(data=type.dict())
+    dictionary_cache.add_type(db_type)
+    await publish("dictionary")
+    return db_type
 
 @router.get("/types", response_model=List[DictionaryType])
 async def get_dictionary_types(current_user: User = Depends(get_current_user)):
-    return await prisma.dictionarytype.find_many()
+    return await dictionary_cache.get_types()
 
 @router.post("/items", response_model=DictionaryItem)
 async def create_dictionary_item(item: DictionaryItemCreate, current_user: User = Depends(get_current_user)):
     if current_user.role not in ["ADMIN"]:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return await prisma.dictionaryitem.create(data=item.dict())
+    db_item = await prisma.dictionaryitem.create(data=item.dict())
+    dictionary_cache.add_item(db_item)
+    await data_changed("dictionary")
+    return db_item
 
 @router.get("/items", response_model=List[DictionaryItem])
-async def get_dictionary_items(type_id: int = None, current_user: User = Depends(get_current_user)):
-    if type_id:
-        return await prisma.dictionaryitem.find_many(where={"type_id": type_id})
-    return await prisma.dictionaryitem.find_many()
\ No newline at end of file
+async def get_dictionary_items(request: Request, response: Response, type_id: int = None, current_user: User = Depends(get_current_user)):
+    etag = make_etag(await dictionary_cache.get_items_etag(), type_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return await dictionary_cache.get_items(type_id)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from typing import Literal
+from app.models.imports import ImportResult
+from app.models.user import User
+from app.dependencies import get_current_user
+from app.services.import_service import import_file
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+@router.post("/{entity}", response_model=ImportResult)
+async def import_endpoint(
+    entity: Literal["projects", "revenues", "costs"],
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role not in ["ADMIN", "ANALYST"]:
+        raise HTTPException(403, "Not authorized")
+    return await import_file(entity, file, current_user)
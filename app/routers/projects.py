@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from app.models.project import ProjectCreate, ProjectUpdate, Project
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Literal, Optional
+from app.models.project import ProjectCreate, ProjectUpdate, Project, ProjectPage
 from app.dependencies import get_current_user
-from app.services.project_service import create_project, update_project
+from app.services.project_service import create_project, update_project, delete_project, list_projects, projects_watermark, search_projects
+from app.utils.etag import make_etag, etag_matches, not_modified
+from app.utils.serialization import FastJSONResponse
+from app.utils.constants import PROJECTS_PAGE_SIZE, PROJECTS_PAGE_SIZE_MAX, SEARCH_MIN_QUERY_LENGTH, SEARCH_LIMIT, SEARCH_LIMIT_MAX
 from app.database.prisma import prisma
 from app.models.user import User
 
@@ -14,10 +17,46 @@ async def create_project_endpoint(project: ProjectCreate, current_user: User = D
         raise HTTPException(status_code=403, detail="Not authorized")
     return await create_project(project, current_user)
 
-@router.get("/", response_model=List[Project])
-async def get_projects(current_user: User = Depends(get_current_user)):
-    projects = await prisma.project.find_many()
-    return [Project(**p.__dict__) for p in projects]
+@router.get("/", response_model=ProjectPage)
+async def get_projects(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(PROJECTS_PAGE_SIZE, ge=1, le=PROJECTS_PAGE_SIZE_MAX),
+    order_by: Literal["id", "updated_at"] = "id",
+    fields: Optional[str] = None,
+    stage_id: Optional[int] = None,
+    manager: Optional[str] = None,
+    business_segment_id: Optional[int] = None,
+    service_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
+    etag = make_etag(await projects_watermark(), str(request.query_params))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    page = await list_projects(
+        limit,
+        cursor=cursor,
+        order_by=order_by,
+        fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        filters={
+            "stage_id": stage_id,
+            "manager": manager,
+            "business_segment_id": business_segment_id,
+            "service_id": service_id,
+        }
+    )
+    return FastJSONResponse(page, headers={"ETag": etag})
+
+@router.get("/search")
+async def search_projects_endpoint(
+    q: str = Query(..., min_length=SEARCH_MIN_QUERY_LENGTH),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=SEARCH_LIMIT_MAX),
+    current_user: User = Depends(get_current_user)
+):
+    q = q.strip()
+    if len(q) < SEARCH_MIN_QUERY_LENGTH:
+        raise HTTPException(400, f"Query must be at least {SEARCH_MIN_QUERY_LENGTH} characters")
+    return FastJSONResponse(await search_projects(q, limit))
 
 @router.get("/{project_id}", response_model=Project)
 async def get_project(project_id: int, current_user: User = Depends(get_current_user)):
@@ -33,19 +72,17 @@ async def update_project_endpoint(project_id: int, update_data: ProjectUpdate, c
     return await update_project(project_id, update_data, current_user)
 
 @router.delete("/{project_id}")
-async def delete_project(project_id: int, current_user: User = Depends(get_current_user)):
+async def delete_project_endpoint(project_id: int, current_user: User = Depends(get_current_user)):
     if current_user.role != "ADMIN":
         raise HTTPException(403, "Not authorized")
-    project = await prisma.project.find_unique(where={"id": project_id})
-    if not project:
-        raise HTTPException(404, "Project not found")
-    await prisma.project.delete(where={"id": project_id})
+    await delete_project(project_id, current_user)
     return {"message": "Deleted"}
 
 @router.get("/{project_id}/changes")
 async def get_changes(project_id: int, current_user: User = Depends(get_current_user)):
+    # entity_id matches the history of a deleted project
     changes = await prisma.changehistory.find_many(
-        where={"project_id": project_id},
+        where={"OR": [{"project_id": project_id}, {"entity_id": project_id}]},
         order={"changed_at": "desc"},
         take=10
     )
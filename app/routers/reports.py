@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from app.models.report import ReportQuery
+from fastapi.responses import FileResponse
+from app.models.report import ReportQuery, TimeSeriesQuery, ForecastQuery, ExportRequest, ExportJob
 from app.models.user import User
 from app.dependencies import get_current_user
 from app.services.report_service import generate_report
-from app.services.export_service import export_to_excel, export_to_pdf
+from app.services.export_service import export_to_excel, export_to_pdf, XLSX_MEDIA_TYPE
+from app.services.export_jobs import submit_export, get_export_job, artifact_path
+from app.services.timeseries_service import get_timeseries
+from app.services.forecast_service import get_forecast
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
@@ -13,16 +17,58 @@ async def generate_report_endpoint(query: ReportQuery, current_user: User = Depe
         raise HTTPException(403, "Not authorized")
     return await generate_report(query)
 
+@router.post("/timeseries", response_model=list)
+async def get_timeseries_endpoint(query: TimeSeriesQuery, current_user: User = Depends(get_current_user)):
+    if current_user.role not in ["ADMIN", "ANALYST"]:
+        raise HTTPException(403, "Not authorized")
+    return await get_timeseries(query)
+
+@router.post("/forecast")
+async def get_forecast_endpoint(query: ForecastQuery, current_user: User = Depends(get_current_user)):
+    if current_user.role not in ["ADMIN", "ANALYST"]:
+        raise HTTPException(403, "Not authorized")
+    return await get_forecast(query)
+
 @router.post("/export/excel")
 async def export_report_excel(query: ReportQuery, current_user: User = Depends(get_current_user)):
     if current_user.role not in ["ADMIN", "ANALYST"]:
         raise HTTPException(403, "Not authorized")
-    report_data = await generate_report(query)
-    return export_to_excel(report_data)
+    return await export_to_excel(query)
 
 @router.post("/export/pdf")
 async def export_report_pdf(query: ReportQuery, current_user: User = Depends(get_current_user)):
     if current_user.role not in ["ADMIN", "ANALYST"]:
         raise HTTPException(403, "Not authorized")
-    report_data = await generate_report(query)
-    return export_to_pdf(report_data)
\ No newline at end of file
+    return await export_to_pdf(query)
+
+EXPORT_MEDIA_TYPES = {"xlsx": XLSX_MEDIA_TYPE, "pdf": "application/pdf"}
+
+@router.post("/exports", response_model=ExportJob, status_code=202)
+async def submit_export_job(request: ExportRequest, current_user: User = Depends(get_current_user)):
+    if current_user.role not in ["ADMIN", "ANALYST"]:
+        raise HTTPException(403, "Not authorized")
+    return await submit_export(request)
+
+@router.get("/exports/{job_id}", response_model=ExportJob)
+async def get_export_job_status(job_id: str, current_user: User = Depends(get_current_user)):
+    if current_user.role not in ["ADMIN", "ANALYST"]:
+        raise HTTPException(403, "Not authorized")
+    job = get_export_job(job_id)
+    if not job:
+        raise HTTPException(404, "Export job not found")
+    return job
+
+@router.get("/exports/{job_id}/download")
+async def download_export(job_id: str, current_user: User = Depends(get_current_user)):
+    if current_user.role not in ["ADMIN", "ANALYST"]:
+        raise HTTPException(403, "Not authorized")
+    job = get_export_job(job_id)
+    if not job:
+        raise HTTPException(404, "Export job not found")
+    if job.status != "done":
+        raise HTTPException(409, f"Export job is {job.status}")
+    return FileResponse(
+        artifact_path(job),
+        media_type=EXPORT_MEDIA_TYPES[job.format],
+        filename=f"report.{job.format}"
+    )
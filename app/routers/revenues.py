@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import List
 from app.models.revenue import RevenueCreate, RevenueUpdate, Revenue
 from app.models.user import User
 from app.dependencies import get_current_user
 from app.database.prisma import prisma
-from app.services.project_service import log_change
+from app.services.project_service import ChangeRecorder, revenues_watermark
+from app.services.dictionary_cache import dictionary_cache
+from app.services.data_version import data_changed
+from app.services.sync_service import record_change
+from app.utils.etag import make_etag, etag_matches, not_modified
+from app.utils.serialization import json_rows
 
 router = APIRouter(prefix="/projects/{project_id}/revenues", tags=["revenues"])
 
+LOCK_REVENUE_SQL = 'SELECT "id" FROM "Revenue" WHERE "id" = $1 AND "project_id" = $2 FOR UPDATE'
+
 @router.post("/", response_model=Revenue)
 async def create_revenue(project_id: int, revenue: RevenueCreate, current_user: User = Depends(get_current_user)):
     if current_user.role not in ["ADMIN", "ANALYST", "USER"]:
@@ -15,22 +22,33 @@ async def create_revenue(project_id: int, revenue: RevenueCreate, current_user:
     project = await prisma.project.find_unique(where={"id": project_id})
     if not project:
         raise HTTPException(404, "Project not found")
-    status = await prisma.dictionaryitem.find_unique(where={"id": revenue.status_id})
-    if not status or status.type_id != (await prisma.dictionarytype.find_unique(where={"name": "revenue_status"})).id:
+    if not await dictionary_cache.get_typed_item(revenue.status_id, "revenue_status"):
         raise HTTPException(400, "Invalid revenue status")
     data = revenue.dict()
     data["project_id"] = project_id
-    db_revenue = await prisma.revenue.create(data=data)
-    await log_change(project_id, current_user.id, "revenue_added", "", str(db_revenue.id))
+    async with prisma.tx() as tx:
+        db_revenue = await tx.revenue.create(data=data)
+        await record_change(tx, "revenue", db_revenue.id, project_id)
+        recorder = ChangeRecorder(project_id, current_user.id)
+        recorder.record("revenue_added", "", str(db_revenue.id))
+        await recorder.flush(tx)
+    await data_changed("revenue", project_id)
     return Revenue(**db_revenue.__dict__)
 
 @router.get("/", response_model=List[Revenue])
-async def get_revenues(project_id: int, current_user: User = Depends(get_current_user)):
+async def get_revenues(project_id: int, request: Request, current_user: User = Depends(get_current_user)):
+    headers = {}
+    watermark = await revenues_watermark(project_id)
+    if watermark is not None:
+        etag = make_etag("revenues", project_id, watermark)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        headers["ETag"] = etag
     project = await prisma.project.find_unique(where={"id": project_id})
     if not project:
         raise HTTPException(404, "Project not found")
     revenues = await prisma.revenue.find_many(where={"project_id": project_id})
-    return [Revenue(**r.__dict__) for r in revenues]
+    return json_rows(revenues, Revenue, headers=headers)
 
 @router.get("/{revenue_id}", response_model=Revenue)
 async def get_revenue(project_id: int, revenue_id: int, current_user: User = Depends(get_current_user)):
@@ -43,28 +61,34 @@ async def get_revenue(project_id: int, revenue_id: int, current_user: User = Dep
 async def update_revenue(project_id: int, revenue_id: int, update_data: RevenueUpdate, current_user: User = Depends(get_current_user)):
     if current_user.role not in ["ADMIN", "ANALYST", "USER"]:
         raise HTTPException(403, "Not authorized")
-    revenue = await prisma.revenue.find_unique(where={"id": revenue_id})
-    if not revenue or revenue.project_id != project_id:
-        raise HTTPException(404, "Revenue not found")
     data = update_data.dict(exclude_unset=True)
-    if "status_id" in data:
-        status = await prisma.dictionaryitem.find_unique(where={"id": data["status_id"]})
-        if not status or status.type_id != (await prisma.dictionarytype.find_unique(where={"name": "revenue_status"})).id:
-            raise HTTPException(400, "Invalid revenue status")
-    for field, new_value in data.items():
-        old_value = getattr(revenue, field)
-        if old_value != new_value:
-            await log_change(project_id, current_user.id, f"revenue_{field}", str(old_value), str(new_value))
-    updated = await prisma.revenue.update(where={"id": revenue_id}, data=data)
+    if "status_id" in data and not await dictionary_cache.get_typed_item(data["status_id"], "revenue_status"):
+        raise HTTPException(400, "Invalid revenue status")
+    async with prisma.tx() as tx:
+        # Lock the row before reading it, so concurrent edits diff against
+        # each other's committed result
+        if not await tx.query_first(LOCK_REVENUE_SQL, revenue_id, project_id):
+            raise HTTPException(404, "Revenue not found")
+        revenue = await tx.revenue.find_unique(where={"id": revenue_id})
+        recorder = ChangeRecorder(project_id, current_user.id)
+        recorder.diff(revenue, data, prefix="revenue_")
+        updated = await tx.revenue.update(where={"id": revenue_id}, data=data)
+        await record_change(tx, "revenue", revenue_id, project_id)
+        await recorder.flush(tx)
+    await data_changed("revenue", project_id)
     return Revenue(**updated.__dict__)
 
 @router.delete("/{revenue_id}")
 async def delete_revenue(project_id: int, revenue_id: int, current_user: User = Depends(get_current_user)):
     if current_user.role not in ["ADMIN"]:
         raise HTTPException(403, "Not authorized")
-    revenue = await prisma.revenue.find_unique(where={"id": revenue_id})
-    if not revenue or revenue.project_id != project_id:
-        raise HTTPException(404, "Revenue not found")
-    await prisma.revenue.delete(where={"id": revenue_id})
-    await log_change(project_id, current_user.id, "revenue_deleted", str(revenue_id), "")
+    async with prisma.tx() as tx:
+        if not await tx.query_first(LOCK_REVENUE_SQL, revenue_id, project_id):
+            raise HTTPException(404, "Revenue not found")
+        await tx.revenue.delete(where={"id": revenue_id})
+        await record_change(tx, "revenue", revenue_id, project_id, deleted=True)
+        recorder = ChangeRecorder(project_id, current_user.id)
+        recorder.record("revenue_deleted", str(revenue_id), "")
+        await recorder.flush(tx)
+    await data_changed("revenue", project_id)
     return {"message": "Revenue deleted"}
\ No newline at end of file
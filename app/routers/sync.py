@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from app.dependencies import get_current_user
+from app.models.user import User
+from app.services.sync_service import get_changes
+from app.utils.constants import SYNC_PAGE_SIZE, SYNC_PAGE_SIZE_MAX
+from app.utils.serialization import FastJSONResponse
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+@router.get("/changes")
+async def get_sync_changes(
+    since: Optional[str] = None,
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_PAGE_SIZE_MAX),
+    current_user: User = Depends(get_current_user)
+):
+    return FastJSONResponse(await get_changes(since, limit))
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from app.models.user import UserCreate, User
-from app.dependencies import get_current_user
+from app.models.user import UserCreate, UserRoleUpdate, User
+from app.dependencies import get_current_user, invalidate_user
 from app.database.prisma import prisma
 from app.services.auth_service import get_password_hash
 
@@ -10,7 +10,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 async def create_user(user: UserCreate, current_user: User = Depends(get_current_user)):
     if current_user.role != "ADMIN":
         raise HTTPException(status_code=403, detail="Not authorized")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     db_user = await prisma.user.create(
         data={
             "username": user.username,
@@ -18,4 +18,19 @@ async def create_user(user: UserCreate, current_user: User = Depends(get_current
             "role": user.role.upper(),
         }
     )
+    await invalidate_user(db_user.username)
+    return User(**db_user.__dict__)
+
+@router.put("/{user_id}/role", response_model=User)
+async def update_user_role(user_id: int, update: UserRoleUpdate, current_user: User = Depends(get_current_user)):
+    if current_user.role != "ADMIN":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    role = update.role.upper()
+    if role not in ["ADMIN", "ANALYST", "USER"]:
+        raise HTTPException(400, "Invalid role")
+    user = await prisma.user.find_unique(where={"id": user_id})
+    if not user:
+        raise HTTPException(404, "User not found")
+    db_user = await prisma.user.update(where={"id": user_id}, data={"role": role})
+    await invalidate_user(db_user.username)
     return User(**db_user.__dict__)
\ No newline at end of file
@@ -1,20 +1,53 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
 from app.database.prisma import prisma
-from app.utils.constants import SECRET_KEY, ALGORITHM
+from app.utils.constants import (
+    SECRET_KEY, ALGORITHM,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS
+)
 import pyotp
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is deliberately slow, so it runs on a small dedicated pool instead of
+# the event loop. At most PASSWORD_HASH_MAX_PENDING hashes may be running or
+# queued; callers that cannot get a slot in time are turned away with a 503.
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+_password_slots = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+
+async def _run_password_task(func, *args):
+    try:
+        await asyncio.wait_for(_password_slots.acquire(), PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent logins, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_slots.release()
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await _run_password_task(pwd_context.verify, password, hashed_password)
+
 async def authenticate_user(username: str, password: str):
     user = await prisma.user.find_unique(where={"username": username})
-    if not user or not pwd_context.verify(password, user.password):
+    if not user or not await verify_password(password, user.password):
         return None
     return user
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_password_hash(password: str) -> str:
+    return await _run_password_task(pwd_context.hash, password)
+
+def shutdown_password_executor():
+    _password_executor.shutdown(wait=False, cancel_futures=True)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
@@ -0,0 +1,21 @@
+from app.database.invalidation import publish, subscribe
+
+# Per-worker counter bumped by every project, revenue and cost write.
+# Caches of derived data (dashboard snapshots, report results) include it in
+# their keys, so a write makes every older entry unreachable at once.
+_data_version = 0
+
+def current_data_version() -> int:
+    return _data_version
+
+def bump_data_version():
+    global _data_version
+    _data_version += 1
+
+async def data_changed(entity: str, key=None):
+    # Bumps this worker's version and has every other worker bump theirs
+    bump_data_version()
+    await publish(entity, key)
+
+for _entity in ("project", "revenue", "cost", "dictionary"):
+    subscribe(_entity, lambda key: bump_data_version())
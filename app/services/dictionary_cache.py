@@ -0,0 +1,116 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from app.database.prisma import prisma
+from app.database.invalidation import subscribe
+from app.utils.etag import make_etag
+
+class DictionaryCache:
+    # Dictionaries are tiny and almost never change, so keep them in memory:
+    # loaded once at startup, updated by the create endpoints and reloaded
+    # lazily after invalidate().
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._types_by_id: Dict[int, object] = {}
+        self._types_by_name: Dict[str, object] = {}
+        self._items_by_id: Dict[int, object] = {}
+        self._items_by_value: Dict[Tuple[int, str], object] = {}
+        self._items_by_type: Dict[int, List[object]] = {}
+        self._etag: Optional[str] = None
+
+    async def load(self):
+        async with self._lock:
+            await self._reload()
+
+    def invalidate(self):
+        self._loaded = False
+
+    def add_type(self, type_):
+        if self._loaded:
+            self._index_type(type_)
+
+    def add_item(self, item):
+        if self._loaded:
+            self._index_item(item)
+
+    async def get_types(self) -> List[object]:
+        await self._ensure_loaded()
+        return list(self._types_by_id.values())
+
+    async def get_type(self, name: str):
+        await self._ensure_loaded()
+        return self._types_by_name.get(name)
+
+    async def get_item(self, item_id: int):
+        await self._ensure_loaded()
+        return self._items_by_id.get(item_id)
+
+    async def find_item(self, type_id: int, value: str):
+        await self._ensure_loaded()
+        return self._items_by_value.get((type_id, value))
+
+    async def get_items(self, type_id: Optional[int] = None) -> List[object]:
+        await self._ensure_loaded()
+        if type_id:
+            return list(self._items_by_type.get(type_id, []))
+        return list(self._items_by_id.values())
+
+    async def get_items_by_type_name(self, type_name: str) -> List[object]:
+        type_ = await self.get_type(type_name)
+        if not type_:
+            return []
+        return await self.get_items(type_.id)
+
+    async def get_items_etag(self) -> str:
+        # Derived from the content, so every worker computes the same tag
+        await self._ensure_loaded()
+        if self._etag is None:
+            self._etag = make_etag([
+                (i.id, i.type_id, i.value, i.probability) for i in self._items_by_id.values()
+            ])
+        return self._etag
+
+    async def get_typed_item(self, item_id: int, type_name: str):
+        # Returns the item only if it belongs to the named dictionary type
+        item = await self.get_item(item_id)
+        type_ = self._types_by_name.get(type_name)
+        if not item or not type_ or item.type_id != type_.id:
+            return None
+        return item
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self._reload()
+
+    async def _reload(self):
+        types = await prisma.dictionarytype.find_many()
+        items = await prisma.dictionaryitem.find_many(order={"id": "asc"})
+        self._types_by_id = {}
+        self._types_by_name = {}
+        self._items_by_id = {}
+        self._items_by_value = {}
+        self._items_by_type = {}
+        self._etag = None
+        for type_ in types:
+            self._index_type(type_)
+        for item in items:
+            self._index_item(item)
+        self._loaded = True
+
+    def _index_type(self, type_):
+        self._types_by_id[type_.id] = type_
+        self._types_by_name[type_.name] = type_
+
+    def _index_item(self, item):
+        self._items_by_id[item.id] = item
+        self._items_by_value[(item.type_id, item.value)] = item
+        self._items_by_type.setdefault(item.type_id, []).append(item)
+        self._etag = None
+
+dictionary_cache = DictionaryCache()
+
+# Other workers changed a dictionary: reload on the next read
+subscribe("dictionary", lambda key: dictionary_cache.invalidate())
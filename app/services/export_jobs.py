@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.database.prisma import prisma
+from app.models.report import ExportJob, ExportRequest, ReportQuery
+from app.services.export_service import build_pdf, write_excel
+from app.services.report_query import CompiledReport
+from app.services.sync_service import settled_txid
+from app.utils.constants import (
+    EXPORT_ARTIFACT_TTL_SECONDS, EXPORT_DIR, EXPORT_JOB_WORKERS, EXPORT_RENDER_PROGRESS
+)
+
+# Background exports. Each job's state is written next to its artifact in
+# EXPORT_DIR, so any worker process can report status and serve the file.
+# Identical submissions share a job through a <key>.key file there holding
+# the job id; the key includes the settled txid of the SyncChange log, which
+# every worker sees the same, so a committed write starts a new job. A job expires
+# EXPORT_ARTIFACT_TTL_SECONDS after it finishes; queued and running jobs are
+# never removed unless their state hasn't been written for that long (the
+# worker running them stopped).
+
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+_jobs: Dict[str, ExportJob] = {}
+_running: Set[str] = set()
+_tasks: Set[asyncio.Task] = set()
+_slots = asyncio.Semaphore(EXPORT_JOB_WORKERS)
+
+def _state_path(job_id: str) -> str:
+    return os.path.join(EXPORT_DIR, f"{job_id}.json")
+
+def artifact_path(job: ExportJob) -> str:
+    return os.path.join(EXPORT_DIR, f"{job.id}.{job.format}")
+
+def _save(job: ExportJob):
+    # Write then rename, so readers in other workers never see a partial file
+    path = _state_path(job.id)
+    with open(path + ".tmp", "w") as f:
+        json.dump(job.dict(), f, default=str)
+    os.replace(path + ".tmp", path)
+
+def _key_path(key: str) -> str:
+    return os.path.join(EXPORT_DIR, f"{key}.key")
+
+def _export_key(request: ExportRequest, txid: Optional[int]) -> str:
+    # Unlike report_key, keeps the requested column order and repeats, since
+    # both end up in the file
+    canonical = json.dumps({
+        "format": request.format,
+        "txid": txid,
+        "fields": list(request.query.fields),
+        "filters": request.query.filters or {},
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _job_for_key(key: str) -> Optional[ExportJob]:
+    try:
+        with open(_key_path(key)) as f:
+            job = get_export_job(f.read().strip())
+    except FileNotFoundError:
+        return None
+    return job if job and job.status != "failed" else None
+
+def _claim_key(key: str, job_id: str) -> Optional[ExportJob]:
+    # Links a complete file into place, which fails if another worker already
+    # claimed the key; returns that worker's job if it is still usable
+    tmp = f"{_key_path(key)}.{job_id}.tmp"
+    with open(tmp, "w") as f:
+        f.write(job_id)
+    try:
+        os.link(tmp, _key_path(key))
+        return None
+    except FileExistsError:
+        existing = _job_for_key(key)
+        if existing is None:
+            # Left by a failed or expired job
+            os.replace(tmp, _key_path(key))
+        return existing
+    finally:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+
+def _is_expired(job: ExportJob, saved_at: float) -> bool:
+    if job.status in ("queued", "running"):
+        return time.time() - saved_at > EXPORT_ARTIFACT_TTL_SECONDS
+    return job.expires_at is None or job.expires_at <= datetime.utcnow()
+
+def _remove(job_id: str):
+    for path in (_state_path(job_id), os.path.join(EXPORT_DIR, f"{job_id}.xlsx"), os.path.join(EXPORT_DIR, f"{job_id}.pdf")):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    _jobs.pop(job_id, None)
+
+def _progress(job: ExportJob):
+    # Reading rows takes the progress up to 1 - EXPORT_RENDER_PROGRESS, the
+    # render step accounts for the rest
+    async def advance(rows: int):
+        job.rows += rows
+        if job.total:
+            job.progress = min(job.rows / job.total, 1.0) * (1 - EXPORT_RENDER_PROGRESS)
+        await asyncio.to_thread(_save, job)
+    return advance
+
+async def _run(job: ExportJob, request: ExportRequest):
+    async with _slots:
+        job.status = "running"
+        await asyncio.to_thread(_save, job)
+        try:
+            sql, params = CompiledReport(request.query).count_sql()
+            job.total = (await prisma.query_first(sql, *params))["count"]
+            if job.format == "xlsx":
+                await write_excel(request.query, artifact_path(job), _progress(job))
+            else:
+                content = await build_pdf(request.query, _progress(job))
+                with open(artifact_path(job), "wb") as f:
+                    await run_in_threadpool(f.write, content)
+            job.status = "done"
+            job.progress = 1.0
+        except Exception as e:
+            job.status = "failed"
+            job.error = e.detail if isinstance(e, HTTPException) else str(e) or type(e).__name__
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.expires_at = job.finished_at + timedelta(seconds=EXPORT_ARTIFACT_TTL_SECONDS)
+            _running.discard(job.id)
+            await asyncio.to_thread(_save, job)
+
+async def submit_export(request: ExportRequest) -> ExportJob:
+    CompiledReport(request.query)  # reject invalid fields and filters before queueing
+    cleanup_expired_exports()
+    key = _export_key(request, await settled_txid())
+    existing = _job_for_key(key)
+    if existing:
+        return existing
+
+    job = ExportJob(id=uuid.uuid4().hex, format=request.format, created_at=datetime.utcnow())
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    await asyncio.to_thread(_save, job)
+    existing = await asyncio.to_thread(_claim_key, key, job.id)
+    if existing:
+        _remove(job.id)
+        return existing
+    _jobs[job.id] = job
+    _running.add(job.id)
+    task = asyncio.create_task(_run(job, request))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+def get_export_job(job_id: str) -> Optional[ExportJob]:
+    if not JOB_ID_RE.match(job_id):
+        return None
+    job = _jobs.get(job_id)
+    if job is not None and job.id in _running:
+        return job
+    try:
+        saved_at = os.path.getmtime(_state_path(job_id))
+        if job is None:
+            with open(_state_path(job_id)) as f:
+                job = ExportJob(**json.load(f))
+    except FileNotFoundError:
+        return None
+    if _is_expired(job, saved_at):
+        _remove(job_id)
+        return None
+    return job
+
+def cleanup_expired_exports():
+    # Artifacts and states of jobs past their TTL, including ones left behind
+    # by a worker that stopped mid-export
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    names = os.listdir(EXPORT_DIR)
+    for name in names:
+        job_id, ext = os.path.splitext(name)
+        if ext != ".json" or job_id in _running or not JOB_ID_RE.match(job_id):
+            continue
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            saved_at = os.path.getmtime(path)
+            with open(path) as f:
+                job = ExportJob(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            continue
+        if _is_expired(job, saved_at):
+            _remove(job_id)
+    # Keys whose job is gone
+    for name in names:
+        key, ext = os.path.splitext(name)
+        if ext != ".key" or not KEY_RE.match(key):
+            continue
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            with open(path) as f:
+                job_id = f.read().strip()
+            if not os.path.exists(_state_path(job_id)):
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
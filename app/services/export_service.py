@@ -1,37 +1,205 @@
-from fastapi.responses import Response
+import asyncio
+import os
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from xml.sax.saxutils import escape
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from io import BytesIO
 from openpyxl import Workbook
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from typing import List, Dict
-
-def export_to_excel(report_data: List[Dict]) -> Response:
-    wb = Workbook()
-    ws = wb.active
-    headers = list(report_data[0].keys()) if report_data else []
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+from typing import Awaitable, Callable, Iterator, List, Dict, Optional
+from app.models.report import ReportQuery
+from app.services.report_service import iter_report
+from app.utils.constants import EXPORT_RENDER_WORKERS
+
+PDF_FONT_NAME = "DejaVuSans"
+PDF_FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+]
+PDF_FONT_SIZE = 8
+PDF_CELL_PADDING = 3
+PDF_MARGIN = 36
+PDF_MIN_COLUMN_WIDTH = 40
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def _excel_value(value):
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    if isinstance(value, dict):
+        return ", ".join(f"{k}: {v}" for k, v in value.items())
+    return value
+
+def _spool_rows(f, rows: List[Dict], headers: List[str]):
+    pickle.dump([[row[h] for h in headers] for row in rows], f)
+
+def render_excel(headers: List[str], spool_path: str, path: str):
+    # Runs in the render pool. Rows arrive as pickled chunks in a spool file,
+    # and write-only workbooks stream them to disk, so memory stays flat
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
     ws.append(headers)
-    for row in report_data:
-        ws.append([row[h] for h in headers])
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return Response(
-        content=buffer.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=report.xlsx"}
+    with open(spool_path, "rb") as f:
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                break
+            for row in chunk:
+                ws.append([_excel_value(v) for v in row])
+    wb.save(path)
+
+async def write_excel(query: ReportQuery, path: str, progress: Optional[Callable[[int], Awaitable[None]]] = None):
+    fd, spool_path = tempfile.mkstemp(suffix=".spool")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for rows in iter_report(query):
+                await run_in_threadpool(_spool_rows, f, rows, query.fields)
+                if progress:
+                    await progress(len(rows))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_get_render_executor(), render_excel, query.fields, spool_path, path)
+    finally:
+        os.unlink(spool_path)
+
+def _iter_file(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+async def export_to_excel(query: ReportQuery) -> StreamingResponse:
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await write_excel(query, path)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return StreamingResponse(
+        _iter_file(path),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": "attachment; filename=report.xlsx"},
+        background=BackgroundTask(os.unlink, path)
     )
 
-def export_to_pdf(report_data: List[Dict]) -> Response:
+def _pdf_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    if isinstance(value, dict):
+        return ", ".join(f"{k}: {v}" for k, v in value.items())
+    return str(value)
+
+def _pdf_font() -> str:
+    # Helvetica has no Cyrillic glyphs, so prefer a TTF font when one is installed
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    for path in PDF_FONT_PATHS:
+        if os.path.exists(path):
+            pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+            return PDF_FONT_NAME
+    return "Helvetica"
+
+def _column_widths(natural: List[float], available: float) -> List[float]:
+    if sum(natural) <= available:
+        return natural
+    # Columns that fit in an equal share keep their natural width, the rest
+    # split whatever is left and wrap
+    widths = list(natural)
+    remaining = set(range(len(natural)))
+    budget = available
+    while remaining:
+        share = budget / len(remaining)
+        fitting = [i for i in remaining if natural[i] <= share]
+        if not fitting:
+            for i in remaining:
+                widths[i] = max(share, PDF_MIN_COLUMN_WIDTH)
+            break
+        for i in fitting:
+            budget -= natural[i]
+            remaining.discard(i)
+    return widths
+
+def render_pdf(fields: List[str], rows: List[List[str]]) -> bytes:
+    # Runs in the render pool; arguments are plain strings so they pickle cheaply
+    font = _pdf_font()
+    data = [fields] + rows
+    natural = [
+        max(stringWidth(row[i], font, PDF_FONT_SIZE) for row in data) + 2 * PDF_CELL_PADDING
+        for i in range(len(fields))
+    ]
+    pagesize = A4 if sum(natural) <= A4[0] - 2 * PDF_MARGIN else landscape(A4)
+    widths = _column_widths(natural, pagesize[0] - 2 * PDF_MARGIN)
+
+    style = ParagraphStyle("cell", fontName=font, fontSize=PDF_FONT_SIZE, leading=PDF_FONT_SIZE + 2)
+    cells = [
+        [
+            Paragraph(escape(text), style) if natural[i] > widths[i] else text
+            for i, text in enumerate(row)
+        ] for row in data
+    ]
+    table = Table(cells, colWidths=widths, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("FONTNAME", (0, 0), (-1, -1), font),
+        ("FONTSIZE", (0, 0), (-1, -1), PDF_FONT_SIZE),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("LEFTPADDING", (0, 0), (-1, -1), PDF_CELL_PADDING),
+        ("RIGHTPADDING", (0, 0), (-1, -1), PDF_CELL_PADDING),
+    ]))
+
     buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    y = 750
-    for row in report_data:
-        c.drawString(100, y, str(row))
-        y -= 20
-    c.save()
-    buffer.seek(0)
+    doc = SimpleDocTemplate(
+        buffer, pagesize=pagesize,
+        leftMargin=PDF_MARGIN, rightMargin=PDF_MARGIN, topMargin=PDF_MARGIN, bottomMargin=PDF_MARGIN
+    )
+    doc.build([table])
+    return buffer.getvalue()
+
+_render_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_render_executor() -> ProcessPoolExecutor:
+    global _render_executor
+    if _render_executor is None:
+        _render_executor = ProcessPoolExecutor(max_workers=EXPORT_RENDER_WORKERS)
+    return _render_executor
+
+def shutdown_render_executor():
+    global _render_executor
+    if _render_executor is not None:
+        _render_executor.shutdown(wait=False, cancel_futures=True)
+        _render_executor = None
+
+async def build_pdf(query: ReportQuery, progress: Optional[Callable[[int], Awaitable[None]]] = None) -> bytes:
+    rows = []
+    async for chunk in iter_report(query):
+        rows.extend([_pdf_value(row[f]) for f in query.fields] for row in chunk)
+        if progress:
+            await progress(len(chunk))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_render_executor(), render_pdf, query.fields, rows)
+
+async def export_to_pdf(query: ReportQuery) -> Response:
     return Response(
-        content=buffer.getvalue(),
+        content=await build_pdf(query),
         media_type="application/pdf",
         headers={"Content-Disposition": "attachment; filename=report.pdf"}
-    )
\ No newline at end of file
+    )
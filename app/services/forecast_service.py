@@ -0,0 +1,102 @@
+import asyncio
+from typing import Dict, List, Optional
+import numpy as np
+from fastapi import HTTPException
+from app.database.prisma import prisma
+from app.models.report import ForecastQuery
+from app.services.data_version import current_data_version
+from app.services.dictionary_cache import dictionary_cache
+
+# Expected revenue = planned amount x project probability. Every revenue row
+# of the portfolio is loaded once per data version into column arrays; period
+# filters, what-if stage probabilities and the breakdowns are then computed
+# with NumPy masks and bincount instead of per-row Python loops.
+
+FORECAST_SQL = '''
+SELECT r."year", r."month", r."amount", p."stage_id", p."business_segment_id",
+       p."manager", COALESCE(p."probability", 0) AS probability
+FROM "Revenue" r JOIN "Project" p ON p."id" = r."project_id"
+WHERE r."year" IS NOT NULL AND r."month" IS NOT NULL
+'''
+
+class ForecastData:
+    def __init__(self, rows: List[Dict]):
+        n = len(rows)
+        self.period = np.fromiter((r["year"] * 100 + r["month"] for r in rows), dtype=np.int64, count=n)
+        self.amount = np.fromiter((r["amount"] for r in rows), dtype=np.float64, count=n)
+        self.probability = np.fromiter((r["probability"] for r in rows), dtype=np.float64, count=n)
+        self.stage_id = np.fromiter((r["stage_id"] for r in rows), dtype=np.int64, count=n)
+        self.segment_id = np.fromiter((r["business_segment_id"] for r in rows), dtype=np.int64, count=n)
+        # Managers are free text, so encode them as indexes into a label array
+        self.managers, self.manager_index = np.unique(
+            np.array([r["manager"] for r in rows], dtype=object).astype(str), return_inverse=True
+        )
+
+_data: Optional[ForecastData] = None
+_data_version: Optional[int] = None
+_lock = asyncio.Lock()
+
+async def _get_data() -> ForecastData:
+    global _data, _data_version
+    version = current_data_version()
+    if _data is not None and _data_version == version:
+        return _data
+    async with _lock:
+        if _data is None or _data_version != version:
+            _data = ForecastData(await prisma.query_raw(FORECAST_SQL))
+            _data_version = version
+    return _data
+
+async def _scenario_probability(data: ForecastData, overrides: Dict[int, float]) -> np.ndarray:
+    probability = data.probability.copy()
+    for stage_id, value in overrides.items():
+        if not await dictionary_cache.get_typed_item(stage_id, "stage"):
+            raise HTTPException(400, f"Invalid stage: {stage_id}")
+        if not 0 <= value <= 1:
+            raise HTTPException(400, f"Probability for stage {stage_id} must be between 0 and 1")
+        probability[data.stage_id == stage_id] = value
+    return probability
+
+def _breakdown(keys: np.ndarray, labels, columns: Dict[str, np.ndarray], name: str) -> List[Dict]:
+    # Sums every column per distinct key with one bincount each
+    unique, index = np.unique(keys, return_inverse=True)
+    sums = {column: np.bincount(index, weights=values, minlength=len(unique)) for column, values in columns.items()}
+    result = []
+    for i, key in enumerate(unique):
+        entry = {name: labels(key)}
+        entry.update({column: float(sums[column][i]) for column in columns})
+        result.append(entry)
+    return result
+
+def _totals(columns: Dict[str, np.ndarray]) -> Dict:
+    return {column: float(values.sum()) for column, values in columns.items()}
+
+async def get_forecast(query: ForecastQuery) -> Dict:
+    data = await _get_data()
+    mask = np.ones(len(data.period), dtype=bool)
+    if query.start:
+        mask &= data.period >= query.start.year * 100 + query.start.month
+    if query.end:
+        mask &= data.period <= query.end.year * 100 + query.end.month
+
+    amount = data.amount[mask]
+    columns = {"amount": amount, "weighted": amount * data.probability[mask]}
+    if query.scenario:
+        probability = await _scenario_probability(data, query.scenario)
+        columns["scenario_weighted"] = amount * probability[mask]
+        columns["delta"] = columns["scenario_weighted"] - columns["weighted"]
+
+    segments = {item.id: item.value for item in await dictionary_cache.get_items_by_type_name("business_segment")}
+    return {
+        "total": _totals(columns),
+        "by_period": [
+            {"year": entry["period"] // 100, "month": entry["period"] % 100, **{k: v for k, v in entry.items() if k != "period"}}
+            for entry in _breakdown(data.period[mask], int, columns, "period")
+        ],
+        "by_segment": _breakdown(
+            data.segment_id[mask], lambda key: segments.get(int(key), int(key)), columns, "business_segment"
+        ),
+        "by_manager": _breakdown(
+            data.manager_index[mask], lambda key: str(data.managers[key]), columns, "manager"
+        ),
+    }
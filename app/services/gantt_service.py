@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+from typing import Dict, List
+from app.database.prisma import prisma
+from app.services.dictionary_cache import dictionary_cache
+
+async def build_gantt(project_ids: List[int]) -> Dict[int, Dict]:
+    # Fixed number of queries no matter how many projects are requested
+    projects = await prisma.project.find_many(where={"id": {"in": project_ids}})
+    if not projects:
+        return {}
+    found_ids = [p.id for p in projects]
+    stays = await prisma.stagetransition.find_many(
+        where={"project_id": {"in": found_ids}},
+        order=[{"project_id": "asc"}, {"entered_at": "asc"}, {"id": "asc"}]
+    )
+    revenues = await prisma.revenue.find_many(where={"project_id": {"in": found_ids}})
+    costs = await prisma.cost.find_many(where={"project_id": {"in": found_ids}})
+
+    stays_by_project: Dict[int, List] = {}
+    for stay in stays:
+        stays_by_project.setdefault(stay.project_id, []).append(stay)
+    revenues_by_project: Dict[int, List] = {}
+    for r in revenues:
+        revenues_by_project.setdefault(r.project_id, []).append(r)
+    costs_by_project: Dict[int, List] = {}
+    for c in costs:
+        costs_by_project.setdefault(c.project_id, []).append(c)
+
+    now = datetime.now(timezone.utc)
+    result = {}
+    for project in projects:
+        result[project.id] = {
+            "stages": await _stage_intervals(project, stays_by_project.get(project.id, []), now),
+            "revenues": [
+                {
+                    "amount": r.amount,
+                    "date": f"{r.year}-{r.month:02d}-01" if r.year and r.month else None
+                } for r in revenues_by_project.get(project.id, [])
+            ],
+            "costs": [
+                {
+                    "amount": c.amount,
+                    "date": f"{c.year}-{c.month:02d}-01" if c.year and c.month else None
+                } for c in costs_by_project.get(project.id, [])
+            ]
+        }
+    return result
+
+async def _stage_intervals(project, stays: List, now: datetime) -> List[Dict]:
+    # Projects without transitions (not backfilled yet) show their current
+    # stage since creation
+    if not stays:
+        return [{
+            "stage": await _stage_name(project.stage_id),
+            "start": project.created_at.isoformat(),
+            "end": now.isoformat()
+        }]
+    return [
+        {
+            "stage": await _stage_name(stay.to_stage),
+            "start": stay.entered_at.isoformat(),
+            "end": (stay.left_at or now).isoformat()
+        } for stay in stays
+    ]
+
+async def _stage_name(stage_id: int):
+    item = await dictionary_cache.get_item(stage_id)
+    return item.value if item else str(stage_id)
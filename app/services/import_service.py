@@ -0,0 +1,216 @@
+import codecs
+import csv
+from typing import Dict, Iterator, List
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from openpyxl import load_workbook
+from prisma.errors import PrismaError
+from pydantic import ValidationError
+from app.database.prisma import prisma
+from app.database.sql import insert_returning
+from app.models.cost import CostCreate
+from app.models.imports import ImportResult, ImportRowError
+from app.models.project import ProjectCreate
+from app.models.revenue import RevenueCreate
+from app.models.user import User
+from app.services.dictionary_cache import dictionary_cache
+from app.services.project_service import ChangeRecorder, validate_project
+from app.services.data_version import data_changed
+from app.services.stage_analytics import record_initial_stages
+from app.services.sync_service import record_inserts
+from app.utils.constants import IMPORT_CHUNK_SIZE, IMPORT_MAX_ERRORS
+
+IMPORT_MODELS = {
+    "projects": ProjectCreate,
+    "revenues": RevenueCreate,
+    "costs": CostCreate,
+}
+
+# Dictionary-backed columns accept either an item id or the item's value
+DICTIONARY_COLUMNS = {
+    "projects": {
+        "service_id": "service",
+        "payment_type_id": "payment_type",
+        "stage_id": "stage",
+        "business_segment_id": "business_segment",
+        "assessment_id": "assessment",
+    },
+    "revenues": {"status_id": "revenue_status"},
+    "costs": {"cost_type_id": "cost_type", "status_id": "cost_status"},
+}
+
+class RowError(Exception):
+    pass
+
+def _iter_xlsx(file) -> Iterator[List]:
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in wb.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+def _iter_csv(file) -> Iterator[List]:
+    sample = file.read(4096)
+    file.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample.decode("utf-8-sig", errors="ignore"), delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(codecs.iterdecode(file, "utf-8-sig"), dialect)
+
+def _open_rows(upload: UploadFile) -> Iterator[List]:
+    name = (upload.filename or "").lower()
+    if name.endswith(".xlsx"):
+        return _iter_xlsx(upload.file)
+    if name.endswith(".csv"):
+        return _iter_csv(upload.file)
+    raise HTTPException(400, "Only .xlsx and .csv files can be imported")
+
+def _next_batch(rows: Iterator[List], size: int) -> List[List]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            break
+    return batch
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(l) for l in err['loc'])}: {err['msg']}" for err in e.errors())
+
+async def _resolve_dictionaries(entity: str, values: Dict):
+    for column, type_name in DICTIONARY_COLUMNS[entity].items():
+        value = values.get(column)
+        if value is None or isinstance(value, int):
+            continue
+        text = str(value).strip()
+        if text.isdigit():
+            values[column] = int(text)
+            continue
+        dict_type = await dictionary_cache.get_type(type_name)
+        item = await dictionary_cache.find_item(dict_type.id, text) if dict_type else None
+        if not item:
+            raise RowError(f"{column}: unknown {type_name} '{text}'")
+        values[column] = item.id
+
+async def _validate_row(entity: str, values: Dict) -> Dict:
+    await _resolve_dictionaries(entity, values)
+    try:
+        model = IMPORT_MODELS[entity](**values)
+    except ValidationError as e:
+        raise RowError(_format_validation_error(e))
+    data = model.dict()
+    try:
+        if entity == "projects":
+            stage = await validate_project(model)
+            data["probability"] = stage.probability
+        elif entity == "revenues":
+            if not await dictionary_cache.get_typed_item(model.status_id, "revenue_status"):
+                raise HTTPException(400, "Invalid revenue status")
+        else:
+            if not await dictionary_cache.get_typed_item(model.cost_type_id, "cost_type"):
+                raise HTTPException(400, "Invalid cost type")
+            if not await dictionary_cache.get_typed_item(model.status_id, "cost_status"):
+                raise HTTPException(400, "Invalid cost status")
+    except HTTPException as e:
+        raise RowError(e.detail)
+    if entity != "projects":
+        project_id = values.get("project_id")
+        if project_id in (None, ""):
+            raise RowError("project_id: field required")
+        try:
+            data["project_id"] = int(project_id)
+        except (TypeError, ValueError):
+            raise RowError("project_id: must be an integer")
+    return data
+
+async def _insert_chunk(entity: str, rows: List[Dict], current_user: User):
+    async with prisma.tx() as tx:
+        if entity == "projects":
+            # updated_at is filled in by Prisma on create, not by a column default
+            inserted = await insert_returning(tx, "Project", rows, ["id"], {"updated_at": "now()"})
+            ids = [row["id"] for row in inserted]
+            history = []
+            for project_id in ids:
+                recorder = ChangeRecorder(project_id, current_user.id)
+                recorder.record("created", "", str(project_id))
+                history.extend(recorder.changes)
+            await tx.changehistory.create_many(data=history)
+            await record_initial_stages(tx, ids)
+            await record_inserts(tx, "project", inserted)
+            return
+        table_name = "Revenue" if entity == "revenues" else "Cost"
+        inserted = await insert_returning(tx, table_name, rows, ["id", "project_id"])
+        await record_inserts(tx, entity[:-1], inserted)
+        # One history entry per project instead of one per imported row
+        counts: Dict[int, int] = {}
+        for row in rows:
+            counts[row["project_id"]] = counts.get(row["project_id"], 0) + 1
+        history = []
+        for project_id, count in counts.items():
+            recorder = ChangeRecorder(project_id, current_user.id)
+            recorder.record(f"{entity}_imported", "", str(count))
+            history.extend(recorder.changes)
+        await tx.changehistory.create_many(data=history)
+
+async def import_file(entity: str, upload: UploadFile, current_user: User) -> ImportResult:
+    rows = _open_rows(upload)
+    header = await run_in_threadpool(_next_batch, rows, 1)
+    if not header:
+        raise HTTPException(400, "File is empty")
+    columns = [str(c).strip() if c is not None else "" for c in header[0]]
+
+    result = ImportResult(total=0, imported=0, errors=[])
+    try:
+        await _import_rows(entity, rows, columns, result, current_user)
+    finally:
+        # Chunks are committed one by one, so whatever made it in is visible
+        # even if a later chunk or the file itself fails
+        if result.imported:
+            await data_changed(entity[:-1])
+    return result
+
+async def _import_rows(entity: str, rows: Iterator[List], columns: List[str], result: ImportResult, current_user: User):
+    row_number = 1
+    while True:
+        batch = await run_in_threadpool(_next_batch, rows, IMPORT_CHUNK_SIZE)
+        if not batch:
+            break
+        valid = []
+        for raw in batch:
+            row_number += 1
+            values = {
+                column: (None if value == "" else value)
+                for column, value in zip(columns, raw) if column
+            }
+            if all(v is None for v in values.values()):
+                continue
+            result.total += 1
+            try:
+                valid.append((row_number, await _validate_row(entity, values)))
+            except RowError as e:
+                _add_error(result, row_number, str(e))
+        if valid and entity != "projects":
+            # One query checks every project referenced by the batch
+            known = await prisma.project.find_many(
+                where={"id": {"in": list({data["project_id"] for _, data in valid})}}
+            )
+            known_ids = {p.id for p in known}
+            for number, data in valid:
+                if data["project_id"] not in known_ids:
+                    _add_error(result, number, f"project_id: project {data['project_id']} not found")
+            valid = [(number, data) for number, data in valid if data["project_id"] in known_ids]
+        if valid:
+            try:
+                await _insert_chunk(entity, [data for _, data in valid], current_user)
+            except PrismaError as e:
+                # The chunk was rolled back as a whole; report it against each of its rows
+                for number, _ in valid:
+                    _add_error(result, number, f"not imported, the database rejected this batch: {e}")
+                continue
+            result.imported += len(valid)
+
+def _add_error(result: ImportResult, row: int, error: str):
+    result.error_count += 1
+    if len(result.errors) < IMPORT_MAX_ERRORS:
+        result.errors.append(ImportRowError(row=row, error=error))
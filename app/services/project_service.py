@@ -1,27 +1,55 @@
+import base64
+import binascii
+import json
+from datetime import datetime
 from fastapi import HTTPException
+from typing import Dict, List, Optional
 from app.database.prisma import prisma
+from app.database.sql import SqlParams, escape_like, quote_ident
 from app.models.project import ProjectCreate, ProjectUpdate, Project
 from app.models.user import User
+from app.services.dictionary_cache import dictionary_cache
+from app.services.data_version import data_changed
+from app.services.stage_analytics import record_stage_transition
+from app.services.sync_service import record_change, record_deletes
 
-async def log_change(project_id: int, user_id: int, field: str, old_value: str, new_value: str):
-    await prisma.changehistory.create(
-        data={
-            "project_id": project_id,
-            "user_id": user_id,
+class ChangeRecorder:
+    # Collects ChangeHistory rows for one project and writes them with a
+    # single create_many, inside the caller's transaction
+    def __init__(self, project_id: int, user_id: int):
+        self.project_id = project_id
+        self.user_id = user_id
+        self.changes: List[Dict] = []
+
+    def record(self, field: str, old_value: str, new_value: str):
+        self.changes.append({
+            "project_id": self.project_id,
+            "user_id": self.user_id,
             "field": field,
             "old_value": old_value,
             "new_value": new_value,
-        }
-    )
+        })
 
-async def create_project(project: ProjectCreate, current_user: User) -> Project:
+    def diff(self, current, data: Dict, prefix: str = "", skip: tuple = ()):
+        for field, new_value in data.items():
+            if field in skip:
+                continue
+            old_value = getattr(current, field)
+            if old_value != new_value:
+                self.record(f"{prefix}{field}", str(old_value), str(new_value))
+
+    async def flush(self, client=prisma):
+        if self.changes:
+            await client.changehistory.create_many(data=self.changes)
+            self.changes = []
+
+async def validate_project(project: ProjectCreate):
+    # Returns the stage item, whose probability the project inherits
     # Validate dictionary items
-    service = await prisma.dictionaryitem.find_unique(where={"id": project.service_id})
-    type_service = await prisma.dictionarytype.find_unique(where={"name": "service"})
-    if not service or service.type_id != type_service.id:
+    if not await dictionary_cache.get_typed_item(project.service_id, "service"):
         raise HTTPException(400, "Invalid service")
     # Similar for payment_type, stage, business_segment
-    stage = await prisma.dictionaryitem.find_unique(where={"id": project.stage_id})
+    stage = await dictionary_cache.get_item(project.stage_id)
     if not stage or stage.probability is None:
         raise HTTPException(400, "Invalid stage")
     # Validate conditional fields
@@ -31,31 +59,176 @@ async def create_project(project: ProjectCreate, current_user: User) -> Project:
         raise HTTPException(400, "Industry manager only if industry solution")
     if project.project_number and not project.industry_solution:
         raise HTTPException(400, "Project number only if industry solution")
-    
+    return stage
+
+async def create_project(project: ProjectCreate, current_user: User) -> Project:
+    stage = await validate_project(project)
     data = project.dict()
     data["probability"] = stage.probability
-    db_project = await prisma.project.create(data=data)
-    await log_change(db_project.id, current_user.id, "created", "", str(db_project.id))
+    async with prisma.tx() as tx:
+        db_project = await tx.project.create(data=data)
+        recorder = ChangeRecorder(db_project.id, current_user.id)
+        recorder.record("created", "", str(db_project.id))
+        await recorder.flush(tx)
+        await record_stage_transition(tx, db_project.id, None, db_project.stage_id, db_project.created_at)
+        await record_change(tx, "project", db_project.id, db_project.id)
+    await data_changed("project", db_project.id)
     return Project(**db_project.__dict__)
 
 async def update_project(project_id: int, update_data: ProjectUpdate, current_user: User) -> Project:
-    project = await prisma.project.find_unique(where={"id": project_id})
-    if not project:
-        raise HTTPException(404, "Project not found")
-    
     data = update_data.dict(exclude_unset=True)
     if "stage_id" in data:
-        stage = await prisma.dictionaryitem.find_unique(where={"id": data["stage_id"]})
+        stage = await dictionary_cache.get_item(data["stage_id"])
         if not stage:
             raise HTTPException(400, "Invalid stage")
         data["probability"] = stage.probability
-        await log_change(project_id, current_user.id, "stage_id", str(project.stage_id), str(data["stage_id"]))
     
-    for field, new_value in data.items():
-        if field == "probability": continue
-        old_value = getattr(project, field)
-        if old_value != new_value:
-            await log_change(project_id, current_user.id, field, str(old_value), str(new_value))
-    
-    updated = await prisma.project.update(where={"id": project_id}, data=data)
-    return Project(**updated.__dict__)
\ No newline at end of file
+    async with prisma.tx() as tx:
+        # Lock the row first, so concurrent updates diff and move the stage
+        # against each other's committed result
+        if not await tx.query_first('SELECT "id" FROM "Project" WHERE "id" = $1 FOR UPDATE', project_id):
+            raise HTTPException(404, "Project not found")
+        project = await tx.project.find_unique(where={"id": project_id})
+        recorder = ChangeRecorder(project_id, current_user.id)
+        recorder.diff(project, data, skip=("probability",))
+        updated = await tx.project.update(where={"id": project_id}, data=data)
+        await recorder.flush(tx)
+        if updated.stage_id != project.stage_id:
+            await record_stage_transition(tx, project_id, project.stage_id, updated.stage_id, updated.updated_at)
+        await record_change(tx, "project", project_id, project_id)
+    await data_changed("project", project_id)
+    return Project(**updated.__dict__)
+
+async def delete_project(project_id: int, current_user: User):
+    # Children go first (their relations restrict deletes), each leaving a
+    # tombstone for /sync/changes. The history is kept: deleting the project
+    # nulls its project_id, entity_id keeps pointing at it
+    async with prisma.tx() as tx:
+        # The row lock blocks new revenues, costs and history for the project
+        # (their foreign keys need a share lock on it) until this commits
+        if not await tx.query_first('SELECT "id" FROM "Project" WHERE "id" = $1 FOR UPDATE', project_id):
+            raise HTTPException(404, "Project not found")
+        recorder = ChangeRecorder(project_id, current_user.id)
+        recorder.record("deleted", str(project_id), "")
+        await recorder.flush(tx)
+        await tx.changehistory.update_many(where={"project_id": project_id}, data={"entity_id": project_id})
+        revenues = await tx.query_raw('DELETE FROM "Revenue" WHERE "project_id" = $1 RETURNING "id", "project_id"', project_id)
+        costs = await tx.query_raw('DELETE FROM "Cost" WHERE "project_id" = $1 RETURNING "id", "project_id"', project_id)
+        await record_deletes(tx, "revenue", revenues)
+        await record_deletes(tx, "cost", costs)
+        await record_change(tx, "project", project_id, project_id, deleted=True)
+        await tx.project.delete(where={"id": project_id})
+    await data_changed("project", project_id)
+
+PROJECT_COLUMNS = list(Project.__fields__)
+
+def _encode_cursor(values: List) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def _decode_cursor(cursor: str, order_by: str) -> List:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+    expected = 2 if order_by == "updated_at" else 1
+    if not isinstance(values, list) or len(values) != expected or type(values[-1]) is not int:
+        raise HTTPException(400, "Invalid cursor")
+    if order_by == "updated_at":
+        try:
+            datetime.fromisoformat(values[0])
+        except (TypeError, ValueError):
+            raise HTTPException(400, "Invalid cursor")
+    return values
+
+async def list_projects(
+    limit: int,
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    fields: Optional[List[str]] = None,
+    filters: Optional[Dict] = None,
+) -> Dict:
+    # Keyset pagination: "id" pages in ascending id order, "updated_at" pages
+    # newest first with id as a tie-breaker
+    fields = fields or PROJECT_COLUMNS
+    for field in fields:
+        if field not in PROJECT_COLUMNS:
+            raise HTTPException(400, f"Invalid field: {field}")
+    key_columns = ["updated_at", "id"] if order_by == "updated_at" else ["id"]
+    columns = list(dict.fromkeys(fields + key_columns))
+
+    params = SqlParams()
+    conditions = []
+    for column, value in (filters or {}).items():
+        if value is not None:
+            conditions.append(f"{quote_ident(column)} = {params.add(value)}")
+    if cursor:
+        values = _decode_cursor(cursor, order_by)
+        if order_by == "updated_at":
+            conditions.append(f'("updated_at", "id") < ({params.add(values[0], "timestamp")}, {params.add(values[1])})')
+        else:
+            conditions.append(f'"id" > {params.add(values[0])}')
+    order = '"updated_at" DESC, "id" DESC' if order_by == "updated_at" else '"id" ASC'
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    rows = await prisma.query_raw(
+        f'SELECT {", ".join(quote_ident(c) for c in columns)} FROM "Project" {where} '
+        f'ORDER BY {order} LIMIT {params.add(limit + 1)}',
+        *params.values
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor([rows[-1][c] for c in key_columns])
+    extra = [c for c in key_columns if c not in fields]
+    for row in rows:
+        for column in extra:
+            del row[column]
+    return {"items": rows, "next_cursor": next_cursor}
+
+# Each branch of the WHERE is served by a trigram GIN index (LIKE/ILIKE and
+# the word-similarity operator <%), so the planner ORs bitmap index scans
+# instead of reading the table. INN prefix hits rank first, then the best
+# fuzzy match on either name, with a bonus when a name starts with the query.
+SEARCH_SQL = """
+SELECT "id", "org_name", "org_inn", "project_name", "stage_id", "manager",
+       GREATEST(
+           word_similarity($1, "org_name"),
+           word_similarity($1, "project_name"),
+           CASE WHEN "org_inn" LIKE $2 THEN 1 ELSE 0 END
+       ) + CASE WHEN "org_name" ILIKE $2 OR "project_name" ILIKE $2 THEN 0.5 ELSE 0 END AS rank
+FROM "Project"
+WHERE "org_inn" LIKE $2
+   OR "org_name" ILIKE $3
+   OR "project_name" ILIKE $3
+   OR $1 <% "org_name"
+   OR $1 <% "project_name"
+ORDER BY rank DESC, "id"
+LIMIT $4
+"""
+
+async def search_projects(q: str, limit: int) -> List[Dict]:
+    escaped = escape_like(q)
+    return await prisma.query_raw(SEARCH_SQL, q, f"{escaped}%", f"%{escaped}%", limit)
+
+# Watermarks are the newest txid in the SyncChange log below the oldest
+# transaction still in flight (every write logs a SyncChange in its own
+# transaction). Ids and timestamps are assigned before commit, so a MAX over
+# them can be overtaken by a transaction that commits later; txids below the
+# horizon are all settled, so these only move forward after a commit. They
+# lag behind by at most the longest running transaction.
+PROJECTS_WATERMARK_SQL = """
+SELECT MAX("txid") AS txid FROM "SyncChange"
+WHERE "entity" = 'project' AND "txid" < txid_snapshot_xmin(txid_current_snapshot())
+"""
+REVENUES_WATERMARK_SQL = """
+SELECT MAX("txid") AS txid FROM "SyncChange"
+WHERE "entity" = 'revenue' AND "project_id" = $1 AND "txid" < txid_snapshot_xmin(txid_current_snapshot())
+"""
+
+async def projects_watermark() -> Optional[int]:
+    row = await prisma.query_first(PROJECTS_WATERMARK_SQL)
+    return row["txid"] if row else None
+
+async def revenues_watermark(project_id: int) -> Optional[int]:
+    row = await prisma.query_first(REVENUES_WATERMARK_SQL, project_id)
+    return row["txid"] if row else None
\ No newline at end of file
@@ -0,0 +1,187 @@
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from app.database.sql import SqlParams, escape_like, quote_ident
+from app.models.report import ReportQuery
+
+# Compiles a ReportQuery into one SQL statement that selects only the
+# requested project columns and computes child-row fields per project:
+#
+#   revenues.amount                 list of values, ordered by row id
+#   revenues.sum(amount)            aggregate (sum, avg, min, max, count)
+#   revenues.sum(amount).by_year    {year: aggregate} breakdown
+#
+# Child rows are read through LATERAL joins on project_id, so paging through
+# the report only touches the children of the projects on each page.
+
+PROJECT_FIELDS = [
+    "id", "org_name", "org_inn", "project_name", "service_id", "payment_type_id",
+    "stage_id", "probability", "manager", "business_segment_id", "realization_year",
+    "industry_solution", "forecast_accepted", "via_dzo", "needs_leadership_control",
+    "assessment_id", "industry_manager", "project_number", "created_at", "updated_at",
+    "status", "done_in_period", "plans_next_period"
+]
+DATETIME_FIELDS = {"realization_year", "created_at", "updated_at"}
+
+CHILD_TABLES = {
+    "revenues": ("Revenue", ["id", "year", "month", "amount", "status_id"]),
+    "costs": ("Cost", ["id", "year", "month", "amount", "cost_type_id", "status_id"]),
+}
+AGGREGATES = {"sum": "SUM", "avg": "AVG", "min": "MIN", "max": "MAX", "count": "COUNT"}
+
+LIST_FIELD_RE = re.compile(r"^(revenues|costs)\.(\w+)$")
+AGGREGATE_FIELD_RE = re.compile(r"^(revenues|costs)\.(sum|avg|min|max|count)\((\w+)\)(\.by_year)?$")
+
+SCALAR_OPERATORS = {"lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
+LIKE_OPERATORS = {"contains": "%{}%", "startswith": "{}%", "endswith": "%{}"}
+
+def _aggregate_expr(func: str, column: str) -> str:
+    expr = f"{AGGREGATES[func]}({quote_ident(column)})"
+    # Projects without child rows report 0 rather than NULL for totals
+    return f"COALESCE({expr}, 0)" if func in ("sum", "count") else expr
+
+class CompiledReport:
+    def __init__(self, query: ReportQuery):
+        self.fields = query.fields
+        self.filters = query.filters or {}
+        self._columns: List[Tuple[str, str]] = []  # (output field, select expression)
+        self._joins: List[str] = []
+        self._lateral: Dict[str, List[str]] = {}
+        for field in self.fields:
+            self._compile_field(field)
+        for relation, exprs in self._lateral.items():
+            table, _ = CHILD_TABLES[relation]
+            alias = f"{relation}_agg"
+            self._joins.append(
+                f"LEFT JOIN LATERAL (SELECT {', '.join(exprs)} FROM {quote_ident(table)} "
+                f'WHERE "project_id" = p."id") {alias} ON TRUE'
+            )
+
+    def _compile_field(self, field: str):
+        if field in PROJECT_FIELDS:
+            self._columns.append((field, f"p.{quote_ident(field)}"))
+            return
+        match = AGGREGATE_FIELD_RE.match(field)
+        if match:
+            relation, func, column, by_year = match.groups()
+            self._check_child_column(field, relation, column)
+            if by_year:
+                self._add_by_year(field, relation, func, column)
+            else:
+                self._add_lateral(field, relation, _aggregate_expr(func, column))
+            return
+        match = LIST_FIELD_RE.match(field)
+        if match:
+            relation, column = match.groups()
+            self._check_child_column(field, relation, column)
+            self._add_lateral(field, relation, f'array_agg({quote_ident(column)} ORDER BY "id")')
+            return
+        raise HTTPException(400, f"Invalid field: {field}")
+
+    def _check_child_column(self, field: str, relation: str, column: str):
+        if column not in CHILD_TABLES[relation][1]:
+            raise HTTPException(400, f"Invalid field: {field}")
+
+    def _add_lateral(self, field: str, relation: str, expr: str):
+        exprs = self._lateral.setdefault(relation, [])
+        alias = f"c{len(exprs)}"
+        exprs.append(f"{expr} AS {alias}")
+        self._columns.append((field, f"{relation}_agg.{alias}"))
+
+    def _add_by_year(self, field: str, relation: str, func: str, column: str):
+        table, _ = CHILD_TABLES[relation]
+        alias = f"by_year_{len(self._joins)}"
+        self._joins.append(
+            f"LEFT JOIN LATERAL (SELECT json_object_agg(year, value ORDER BY year) AS value FROM ("
+            f"SELECT \"year\" AS year, {_aggregate_expr(func, column)} AS value FROM {quote_ident(table)} "
+            f'WHERE "project_id" = p."id" AND "year" IS NOT NULL GROUP BY "year") t) {alias} ON TRUE'
+        )
+        self._columns.append((field, f"{alias}.value"))
+
+    def sql(self, after_id: Optional[int] = None, limit: Optional[int] = None) -> Tuple[str, List[Any]]:
+        params = SqlParams()
+        select = ['p."id" AS "__id"'] + [f"{expr} AS c_{i}" for i, (_, expr) in enumerate(self._columns)]
+        conditions = []
+        where = compile_filters(self.filters, params)
+        if where:
+            conditions.append(where)
+        if after_id is not None:
+            conditions.append(f'p."id" > {params.add(after_id)}')
+        sql = f'SELECT {", ".join(select)} FROM "Project" p {" ".join(self._joins)}'
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        sql += ' ORDER BY p."id"'
+        if limit is not None:
+            sql += f" LIMIT {params.add(limit)}"
+        return sql, params.values
+
+    def count_sql(self) -> Tuple[str, List[Any]]:
+        params = SqlParams()
+        where = compile_filters(self.filters, params)
+        sql = 'SELECT COUNT(*) AS count FROM "Project" p'
+        if where:
+            sql += f" WHERE {where}"
+        return sql, params.values
+
+    def convert_row(self, raw: Dict) -> Dict:
+        row = {}
+        for i, (field, _) in enumerate(self._columns):
+            value = raw[f"c_{i}"]
+            if field in DATETIME_FIELDS and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            elif field.endswith(".by_year"):
+                value = json.loads(value) if isinstance(value, str) else (value or {})
+            elif LIST_FIELD_RE.match(field) and value is None:
+                value = []
+            row[field] = value
+        return row
+
+def _compile_condition(column: str, condition: Any, params: SqlParams) -> str:
+    ident = f"p.{quote_ident(column)}"
+    cast = "timestamp" if column in DATETIME_FIELDS else None
+    if not isinstance(condition, dict):
+        if condition is None:
+            return f"{ident} IS NULL"
+        return f"{ident} = {params.add(condition, cast)}"
+    insensitive = condition.get("mode") == "insensitive"
+    parts = []
+    for op, value in condition.items():
+        if op == "mode":
+            continue
+        if op == "equals":
+            parts.append(_compile_condition(column, value, params))
+        elif op == "not":
+            parts.append(f"NOT ({_compile_condition(column, value, params)})")
+        elif op in ("in", "not_in"):
+            placeholders = ", ".join(params.add(v, cast) for v in value) or "NULL"
+            parts.append(f"{ident} {'NOT IN' if op == 'not_in' else 'IN'} ({placeholders})")
+        elif op in SCALAR_OPERATORS:
+            parts.append(f"{ident} {SCALAR_OPERATORS[op]} {params.add(value, cast)}")
+        elif op in LIKE_OPERATORS:
+            like = "ILIKE" if insensitive else "LIKE"
+            parts.append(f"{ident} {like} {params.add(LIKE_OPERATORS[op].format(escape_like(value)))}")
+        else:
+            raise HTTPException(400, f"Unsupported filter: {column}.{op}")
+    return " AND ".join(f"({p})" for p in parts) or "TRUE"
+
+def compile_filters(filters: Dict, params: SqlParams) -> str:
+    # Translates the Prisma-style where dicts accepted by ReportQuery.filters
+    # (scalar Project fields, AND/OR/NOT) into SQL
+    parts = []
+    for key, value in filters.items():
+        if key in ("AND", "OR"):
+            clauses = value if isinstance(value, list) else [value]
+            compiled = [compile_filters(c, params) or "TRUE" for c in clauses]
+            if compiled:
+                parts.append(f" {key} ".join(f"({c})" for c in compiled))
+        elif key == "NOT":
+            clauses = value if isinstance(value, list) else [value]
+            for c in clauses:
+                parts.append(f"NOT ({compile_filters(c, params) or 'TRUE'})")
+        elif key in PROJECT_FIELDS:
+            parts.append(_compile_condition(key, value, params))
+        else:
+            raise HTTPException(400, f"Unsupported filter: {key}")
+    return " AND ".join(f"({p})" for p in parts)
@@ -1,115 +1,134 @@
-from fastapi import HTTPException
+import hashlib
+import json
 from app.database.prisma import prisma
 from app.models.report import ReportQuery
-from typing import List, Dict
+from app.services.report_query import CompiledReport
+from app.services.data_version import current_data_version
+from app.services.dictionary_cache import dictionary_cache
+from app.services.stage_analytics import get_stage_durations
+from app.utils.cache import TTLCache
+from app.utils.constants import (
+    DASHBOARD_CACHE_TTL_SECONDS, REPORT_CHUNK_SIZE,
+    REPORT_CACHE_SIZE, REPORT_CACHE_TTL_SECONDS, REPORT_CACHE_MAX_ROWS
+)
+from typing import AsyncIterator, List, Dict
 from datetime import datetime, timedelta
 
+dashboard_cache = TTLCache(maxsize=128, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+report_cache = TTLCache(maxsize=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL_SECONDS)
+
+def report_key(query: ReportQuery) -> str:
+    # Field order and filter key order don't change the rows, only the layout
+    canonical = json.dumps(
+        {"fields": sorted(set(query.fields)), "filters": query.filters or {}},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
 async def generate_report(query: ReportQuery) -> List[Dict]:
-    # Validate fields
-    valid_fields = [
-        "id", "org_name", "org_inn", "project_name", "service_id", "payment_type_id",
-        "stage_id", "probability", "manager", "business_segment_id", "realization_year",
-        "industry_solution", "forecast_accepted", "via_dzo", "needs_leadership_control",
-        "assessment_id", "industry_manager", "project_number", "created_at", "updated_at",
-        "status", "done_in_period", "plans_next_period"
-    ]
-    for field in query.fields:
-        if field not in valid_fields and not field.startswith("revenues.") and not field.startswith("costs."):
-            raise HTTPException(400, f"Invalid field: {field}")
+    key = (current_data_version(), report_key(query))
+    rows = report_cache.get(key)
+    if rows is not None:
+        return rows
+    report = CompiledReport(query)
+    sql, params = report.sql()
+    rows = [report.convert_row(row) for row in await prisma.query_raw(sql, *params)]
+    if len(rows) <= REPORT_CACHE_MAX_ROWS:
+        report_cache.set(key, rows)
+    return rows
 
-    # Build include for related data
-    include = {}
-    if any(f.startswith("revenues.") for f in query.fields):
-        include["revenues"] = True
-    if any(f.startswith("costs.") for f in query.fields):
-        include["costs"] = True
+async def iter_report(query: ReportQuery, chunk_size: int = REPORT_CHUNK_SIZE) -> AsyncIterator[List[Dict]]:
+    key = (current_data_version(), report_key(query))
+    cached = report_cache.get(key)
+    if cached is not None:
+        for i in range(0, len(cached), chunk_size):
+            yield cached[i:i + chunk_size]
+        return
 
-    # Query projects with filters and include
-    projects = await prisma.project.find_many(
-        where=query.filters,
-        include=include
-    )
+    # Keyset pagination on id so only one chunk of projects is held at a time;
+    # small reports are kept so the preview and other exports can reuse them
+    report = CompiledReport(query)
+    collected = []
+    last_id = None
+    while True:
+        sql, params = report.sql(after_id=last_id, limit=chunk_size)
+        rows = await prisma.query_raw(sql, *params)
+        if not rows:
+            break
+        chunk = [report.convert_row(row) for row in rows]
+        if collected is not None:
+            collected.extend(chunk)
+            if len(collected) > REPORT_CACHE_MAX_ROWS:
+                collected = None
+        yield chunk
+        if len(rows) < chunk_size:
+            break
+        last_id = rows[-1]["__id"]
+    if collected is not None:
+        report_cache.set(key, collected)
 
-    # Process results to match requested fields
-    result = []
-    for project in projects:
-        row = {}
-        for field in query.fields:
-            if field in valid_fields:
-                row[field] = getattr(project, field)
-            elif field.startswith("revenues."):
-                subfield = field.split(".")[1]
-                row[field] = [getattr(r, subfield) for r in getattr(project, "revenues", [])]
-            elif field.startswith("costs."):
-                subfield = field.split(".")[1]
-                row[field] = [getattr(c, subfield) for c in getattr(project, "costs", [])]
-        result.append(row)
-    
-    return result
+def _dashboard_bucket(value: datetime = None):
+    # Requests within the same minute share a snapshot
+    return value.replace(second=0, microsecond=0).isoformat() if value else None
 
 async def get_dashboard_stats(start_date: datetime = None, end_date: datetime = None) -> Dict:
+    key = (current_data_version(), _dashboard_bucket(start_date), _dashboard_bucket(end_date))
+    stats = dashboard_cache.get(key)
+    if stats is None:
+        stats = await _compute_dashboard_stats(start_date, end_date)
+        dashboard_cache.set(key, stats)
+    return stats
+
+def _rollup(groups: List[Dict], field: str) -> List[Dict]:
+    totals = {}
+    for group in groups:
+        bucket = totals.setdefault(group[field], {field: group[field], "_count": {"_all": 0}, "_sum": {"probability": 0}})
+        bucket["_count"]["_all"] += group["_count"]["_all"]
+        bucket["_sum"]["probability"] += group["_sum"]["probability"] or 0
+    return list(totals.values())
+
+async def _compute_dashboard_stats(start_date: datetime = None, end_date: datetime = None) -> Dict:
     # Default to last 30 days if no dates provided
     if not start_date:
         start_date = datetime.utcnow() - timedelta(days=30)
     if not end_date:
         end_date = datetime.utcnow()
 
-    # Total projects and revenue
-    total_projects = await prisma.project.count()
-    total_revenue = await prisma.revenue.aggregate(
-        where={"created_at": {"gte": start_date, "lte": end_date}},
-        _sum={"amount": True}
-    )
-
-    # Projects by stage
-    stages = await prisma.dictionaryitem.find_many(where={"type_id": (await prisma.dictionarytype.find_unique(where={"name": "stage"})).id})
-    stage_counts = []
-    for stage in stages:
-        count = await prisma.project.count(where={"stage_id": stage.id})
-        stage_counts.append({"stage": stage.value, "count": count})
-
-    # Projects by manager, segment, service
-    manager_counts = await prisma.project.group_by(
-        by=["manager"],
+    # One grouped scan of projects feeds the totals and every breakdown below
+    groups = await prisma.project.group_by(
+        by=["stage_id", "manager", "business_segment_id", "service_id"],
         count=True,
         sum={"probability": True}
     )
-    segment_counts = await prisma.project.group_by(
-        by=["business_segment_id"],
-        count=True,
-        sum={"probability": True}
+    total_projects = sum(g["_count"]["_all"] for g in groups)
+
+    # Revenue rows are dated by year/month, so sum per period and keep the
+    # periods that fall inside the window
+    revenue_periods = await prisma.revenue.group_by(
+        by=["year", "month"],
+        sum={"amount": True}
     )
-    service_counts = await prisma.project.group_by(
-        by=["service_id"],
-        count=True,
-        sum={"probability": True}
+    first_period = (start_date.year, start_date.month)
+    last_period = (end_date.year, end_date.month)
+    total_revenue = sum(
+        p["_sum"]["amount"] or 0 for p in revenue_periods
+        if p["year"] and p["month"] and first_period <= (p["year"], p["month"]) <= last_period
     )
 
-    # Average stage duration (simplified, needs ChangeHistory analysis for precision)
-    stage_durations = []
-    for stage in stages:
-        changes = await prisma.changehistory.find_many(
-            where={"field": "stage_id", "new_value": str(stage.id)},
-            include={"project": True}
-        )
-        durations = []
-        for change in changes:
-            next_change = await prisma.changehistory.find_first(
-                where={"project_id": change.project_id, "field": "stage_id", "changed_at": {"gt": change.changed_at}},
-                order={"changed_at": "asc"}
-            )
-            if next_change:
-                duration = (next_change.changed_at - change.changed_at).total_seconds() / 86400  # days
-                durations.append(duration)
-        avg_duration = sum(durations) / len(durations) if durations else 0
-        stage_durations.append({"stage": stage.value, "avg_duration_days": avg_duration})
+    # Projects by stage
+    stage_totals = {g["stage_id"]: g["_count"]["_all"] for g in _rollup(groups, "stage_id")}
+    stages = await dictionary_cache.get_items_by_type_name("stage")
+    stage_counts = [{"stage": stage.value, "count": stage_totals.get(stage.id, 0)} for stage in stages]
+
+    # Stage durations from a single pass over the stage_id history
+    stage_durations = await get_stage_durations(start_date, end_date)
 
     return {
         "total_projects": total_projects,
-        "total_revenue": total_revenue._sum.amount or 0,
+        "total_revenue": total_revenue,
         "stage_counts": stage_counts,
-        "manager_counts": manager_counts,
-        "segment_counts": segment_counts,
-        "service_counts": service_counts,
+        "manager_counts": _rollup(groups, "manager"),
+        "segment_counts": _rollup(groups, "business_segment_id"),
+        "service_counts": _rollup(groups, "service_id"),
         "stage_durations": stage_durations
-    }
\ No newline at end of file
+    }
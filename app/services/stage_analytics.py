@@ -0,0 +1,115 @@
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from app.database.prisma import prisma
+from app.services.dictionary_cache import dictionary_cache
+
+# Every StageTransition row is one completed or ongoing stay in a stage, so
+# durations are a range read on entered_at. The window applies to the moment
+# the stage was entered; stays that have not ended yet are left out.
+STAGE_DURATIONS_SQL = """
+SELECT to_stage AS stage_id,
+       COUNT(*) AS transitions,
+       AVG(days) AS avg_days,
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY days) AS median_days,
+       percentile_cont(0.9) WITHIN GROUP (ORDER BY days) AS p90_days
+FROM (
+    SELECT to_stage,
+           (EXTRACT(EPOCH FROM left_at - entered_at) / 86400)::double precision AS days
+    FROM "StageTransition"
+    WHERE left_at IS NOT NULL
+      AND entered_at >= $1::timestamp
+      AND entered_at <= $2::timestamp
+) stays
+GROUP BY to_stage
+"""
+
+# Rebuilds StageTransition from the stage_id history. Each project starts in
+# the stage its first change moved it out of (or its current stage when it
+# has none) at created_at; repeated entries of the same stage (older updates
+# logged stage_id twice) are collapsed before pairing stays with the next one.
+BACKFILL_SQL = """
+WITH entries AS (
+    SELECT p.id AS project_id,
+           CASE WHEN first_change.found IS NULL THEN p.stage_id
+                WHEN first_change.old_value ~ '^[0-9]+$' THEN first_change.old_value::int END AS to_stage,
+           p.created_at AS entered_at,
+           0 AS ord,
+           0 AS id
+    FROM "Project" p
+    LEFT JOIN LATERAL (
+        SELECT 1 AS found, old_value FROM "ChangeHistory" h
+        WHERE h.project_id = p.id AND h.field = 'stage_id'
+        ORDER BY h.changed_at, h.id LIMIT 1
+    ) first_change ON TRUE
+    UNION ALL
+    SELECT project_id, new_value::int, changed_at, 1, id
+    FROM "ChangeHistory"
+    WHERE field = 'stage_id' AND new_value ~ '^[0-9]+$' AND project_id IS NOT NULL
+), ordered AS (
+    SELECT *, LAG(to_stage) OVER (PARTITION BY project_id ORDER BY ord, entered_at, id) AS prev_stage
+    FROM entries
+    WHERE to_stage IS NOT NULL
+), stays AS (
+    SELECT * FROM ordered WHERE prev_stage IS DISTINCT FROM to_stage
+)
+INSERT INTO "StageTransition" (project_id, from_stage, to_stage, entered_at, left_at)
+SELECT project_id,
+       LAG(to_stage) OVER w,
+       to_stage,
+       entered_at,
+       LEAD(entered_at) OVER w
+FROM stays
+WINDOW w AS (PARTITION BY project_id ORDER BY ord, entered_at, id)
+"""
+
+async def record_stage_transition(client, project_id: int, from_stage: Optional[int], to_stage: int, at: datetime):
+    # Closes the open stay and opens the next one; call inside the transaction
+    # that changes Project.stage_id
+    if from_stage is not None:
+        await client.stagetransition.update_many(
+            where={"project_id": project_id, "left_at": None},
+            data={"left_at": at}
+        )
+    await client.stagetransition.create(data={
+        "project_id": project_id,
+        "from_stage": from_stage,
+        "to_stage": to_stage,
+        "entered_at": at,
+    })
+
+async def record_initial_stages(client, project_ids: List[int]):
+    # Opens the first stay for projects bulk-inserted outside create_project
+    if project_ids:
+        await client.execute_raw(
+            'INSERT INTO "StageTransition" (project_id, to_stage, entered_at) '
+            'SELECT "id", "stage_id", "created_at" FROM "Project" '
+            'WHERE "id" IN (SELECT jsonb_array_elements_text($1::jsonb)::int)',
+            json.dumps(project_ids)
+        )
+
+async def backfill_stage_transitions() -> int:
+    # One statement over the whole history, so allow more than the default 5s
+    async with prisma.tx(timeout=timedelta(minutes=10)) as tx:
+        await tx.execute_raw('DELETE FROM "StageTransition"')
+        return await tx.execute_raw(BACKFILL_SQL)
+
+async def get_stage_durations(start_date: Optional[datetime], end_date: Optional[datetime]) -> List[Dict]:
+    rows = await prisma.query_raw(
+        STAGE_DURATIONS_SQL,
+        start_date or datetime.min,
+        end_date or datetime.max,
+    )
+    by_stage = {row["stage_id"]: row for row in rows}
+
+    stage_durations = []
+    for stage in await dictionary_cache.get_items_by_type_name("stage"):
+        row = by_stage.get(stage.id, {})
+        stage_durations.append({
+            "stage": stage.value,
+            "transitions": row.get("transitions", 0),
+            "avg_duration_days": row.get("avg_days") or 0,
+            "median_duration_days": row.get("median_days") or 0,
+            "p90_duration_days": row.get("p90_days") or 0,
+        })
+    return stage_durations
@@ -0,0 +1,109 @@
+import base64
+import binascii
+import json
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from app.database.prisma import prisma
+from app.models.cost import Cost
+from app.models.project import Project
+from app.models.revenue import Revenue
+from app.utils.serialization import rows_to_dicts
+
+# Writes append (entity, id) rows to SyncChange in their own transaction, and
+# /sync/changes replays the log from a cursor. The cursor is a (txid, id)
+# position; a page only reaches up to the oldest transaction still in flight,
+# so a slow transaction delays its changes instead of having them skipped.
+
+SYNC_ENTITIES = {
+    "project": ("projects", Project),
+    "revenue": ("revenues", Revenue),
+    "cost": ("costs", Cost),
+}
+
+async def record_change(client, entity: str, entity_id: int, project_id: int, deleted: bool = False):
+    await client.syncchange.create(data={
+        "entity": entity,
+        "entity_id": entity_id,
+        "project_id": project_id,
+        "deleted": deleted,
+    })
+
+async def record_deletes(client, entity: str, rows: List[Dict]):
+    # rows are what DELETE ... RETURNING "id", "project_id" returned
+    if rows:
+        await client.syncchange.create_many(data=[
+            {"entity": entity, "entity_id": row["id"], "project_id": row["project_id"], "deleted": True}
+            for row in rows
+        ])
+
+async def record_inserts(client, entity: str, rows: List[Dict]):
+    # For bulk inserts; rows are what insert_returning returned ("id", plus
+    # "project_id" for revenues and costs)
+    if rows:
+        project_key = "id" if entity == "project" else "project_id"
+        await client.syncchange.create_many(data=[
+            {"entity": entity, "entity_id": row["id"], "project_id": row[project_key]}
+            for row in rows
+        ])
+
+async def settled_txid() -> Optional[int]:
+    # Newest logged transaction below the horizon: the same across workers,
+    # and only moves forward after a commit
+    row = await prisma.query_first(
+        'SELECT MAX("txid") AS txid FROM "SyncChange" WHERE "txid" < txid_snapshot_xmin(txid_current_snapshot())'
+    )
+    return row["txid"] if row else None
+
+def _encode_cursor(position: Tuple[int, int]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2 or not all(isinstance(v, int) for v in values):
+        raise HTTPException(400, "Invalid cursor")
+    return values[0], values[1]
+
+async def get_changes(since: Optional[str], limit: int) -> Dict:
+    row = await prisma.query_first("SELECT txid_snapshot_xmin(txid_current_snapshot()) AS horizon")
+    horizon = (row["horizon"], 0)
+    result = {
+        "projects": [], "revenues": [], "costs": [],
+        "deleted": {"projects": [], "revenues": [], "costs": []},
+        "has_more": False,
+    }
+    # Without a cursor, hand out the current position: clients take it before
+    # their initial full load and sync from there
+    if not since:
+        result["cursor"] = _encode_cursor(horizon)
+        return result
+
+    position = _decode_cursor(since)
+    log = await prisma.query_raw(
+        'SELECT "id", "txid", "entity", "entity_id", "deleted" FROM "SyncChange" '
+        'WHERE ("txid", "id") > ($1::bigint, $2) AND "txid" < $3::bigint '
+        'ORDER BY "txid", "id" LIMIT $4',
+        position[0], position[1], horizon[0], limit + 1
+    )
+    if len(log) > limit:
+        log = log[:limit]
+        result["has_more"] = True
+        position = (log[-1]["txid"], log[-1]["id"])
+    else:
+        position = max(position, horizon)
+    result["cursor"] = _encode_cursor(position)
+
+    # Only the latest entry per row matters
+    latest: Dict[Tuple[str, int], bool] = {}
+    for entry in log:
+        latest[(entry["entity"], entry["entity_id"])] = entry["deleted"]
+    for entity, (key, model) in SYNC_ENTITIES.items():
+        upserted = [entity_id for (e, entity_id), deleted in latest.items() if e == entity and not deleted]
+        result["deleted"][key] = [entity_id for (e, entity_id), deleted in latest.items() if e == entity and deleted]
+        if upserted:
+            # Rows deleted since are missing here; their tombstone is in a later page
+            rows = await getattr(prisma, entity).find_many(where={"id": {"in": upserted}}, order={"id": "asc"})
+            result[key] = rows_to_dicts(rows, model)
+    return result
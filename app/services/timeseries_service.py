@@ -0,0 +1,66 @@
+from typing import Dict, List, Optional, Tuple
+from app.database.prisma import prisma
+from app.database.sql import SqlParams
+from app.models.report import TimeSeriesQuery
+from app.services.dictionary_cache import dictionary_cache
+from app.services.report_query import compile_filters
+
+# Group expressions per child table. Revenue and cost statuses live in
+# different dictionaries, so status groups are matched by item value.
+GROUP_COLUMNS = {
+    "status": ('t."status_id"', True),
+    "business_segment": ('p."business_segment_id"', True),
+    "service": ('p."service_id"', True),
+    "manager": ('p."manager"', False),
+}
+
+def _month_range(query: TimeSeriesQuery, params: SqlParams) -> List[str]:
+    conditions = ['t."year" IS NOT NULL', 't."month" IS NOT NULL']
+    if query.start:
+        conditions.append(f'(t."year", t."month") >= ({params.add(query.start.year)}, {params.add(query.start.month)})')
+    if query.end:
+        conditions.append(f'(t."year", t."month") <= ({params.add(query.end.year)}, {params.add(query.end.month)})')
+    return conditions
+
+def _sql(query: TimeSeriesQuery) -> Tuple[str, List]:
+    params = SqlParams()
+    conditions = _month_range(query, params)
+    where = compile_filters(query.filters, params)
+    if where:
+        conditions.append(where)
+    group = GROUP_COLUMNS[query.group_by][0] if query.group_by else "NULL"
+    selects = []
+    for kind, table in (("revenue", "Revenue"), ("cost", "Cost")):
+        selects.append(
+            f"SELECT '{kind}' AS kind, t.\"year\" AS year, t.\"month\" AS month, {group} AS grp, "
+            f'SUM(t."amount") AS amount FROM "{table}" t JOIN "Project" p ON p."id" = t."project_id" '
+            f"WHERE {' AND '.join(conditions)} GROUP BY 2, 3, 4"
+        )
+    # Both halves share the parameter list, so one statement covers both tables
+    return " UNION ALL ".join(selects), params.values
+
+async def _group_label(group_by: Optional[str], value):
+    if not group_by or value is None:
+        return value
+    if GROUP_COLUMNS[group_by][1]:
+        item = await dictionary_cache.get_item(value)
+        return item.value if item else str(value)
+    return value
+
+async def get_timeseries(query: TimeSeriesQuery) -> List[Dict]:
+    sql, params = _sql(query)
+    series: Dict[Tuple, Dict] = {}
+    for row in await prisma.query_raw(sql, *params):
+        group = await _group_label(query.group_by, row["grp"])
+        key = (row["year"], row["month"], group)
+        point = series.get(key)
+        if point is None:
+            point = {"year": row["year"], "month": row["month"], "revenue": 0.0, "cost": 0.0}
+            if query.group_by:
+                point[query.group_by] = group
+            series[key] = point
+        point[row["kind"]] += row["amount"] or 0.0
+    points = sorted(series.values(), key=lambda p: (p["year"], p["month"], str(p.get(query.group_by, ""))))
+    for point in points:
+        point["margin"] = point["revenue"] - point["cost"]
+    return points
@@ -5,4 +5,52 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 DICT_TYPES = [
     "service", "payment_type", "stage", "business_segment",
     "revenue_status", "cost_type", "cost_status", "assessment"
-]
\ No newline at end of file
+]
+
+DASHBOARD_CACHE_TTL_SECONDS = 30
+
+GANTT_BATCH_LIMIT = 500
+
+REPORT_CHUNK_SIZE = 1000
+
+EXPORT_RENDER_WORKERS = 2
+
+PROJECTS_PAGE_SIZE = 50
+PROJECTS_PAGE_SIZE_MAX = 200
+
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL_SECONDS = 300
+
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_MAX_PENDING = 32
+PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS = 2
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+REPORT_CACHE_SIZE = 32
+REPORT_CACHE_TTL_SECONDS = 600
+REPORT_CACHE_MAX_ROWS = 50000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+SLOW_REQUEST_SECONDS = 1.0
+
+EXPORT_JOB_WORKERS = 2
+EXPORT_DIR = "exports"
+EXPORT_ARTIFACT_TTL_SECONDS = 3600
+# Share of a job's progress taken by the xlsx/pdf render after all rows are read
+EXPORT_RENDER_PROGRESS = 0.2
+
+INVALIDATION_CHANNEL = "cache_invalidation"
+INVALIDATION_HEARTBEAT_SECONDS = 30
+INVALIDATION_RECONNECT_SECONDS = 5
+
+SEARCH_MIN_QUERY_LENGTH = 3
+SEARCH_LIMIT = 20
+SEARCH_LIMIT_MAX = 100
+
+SYNC_PAGE_SIZE = 1000
+SYNC_PAGE_SIZE_MAX = 5000
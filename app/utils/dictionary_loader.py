@@ -1,29 +1,49 @@
 import json
+from typing import Dict
 from app.database.prisma import prisma
 from app.utils.constants import DICT_TYPES
 
-async def load_dictionaries_from_file(file_path: str):
+async def sync_dictionaries(data: Dict) -> Dict[str, int]:
+    # Reads every type and item once, diffs them against `data` in memory and
+    # writes only what is missing or changed
+    summary = {"types_created": 0, "items_created": 0, "items_updated": 0}
+
+    types = {t.name: t for t in await prisma.dictionarytype.find_many()}
+    missing_types = [name for name in DICT_TYPES if name not in types]
+    if missing_types:
+        summary["types_created"] = await prisma.dictionarytype.create_many(
+            data=[{"name": name} for name in missing_types],
+            skip_duplicates=True
+        )
+        types = {t.name: t for t in await prisma.dictionarytype.find_many()}
+
+    existing = {(i.type_id, i.value): i for i in await prisma.dictionaryitem.find_many()}
+    to_create = {}
+    to_update = []
+    for type_name in DICT_TYPES:
+        type_data = types[type_name]
+        for item in data.get(type_name, []):
+            key = (type_data.id, item["value"])
+            current = existing.get(key)
+            probability = item.get("probability")
+            if current is None:
+                to_create.setdefault(key, {"type_id": type_data.id, "value": item["value"], "probability": probability})
+            elif current.probability != probability:
+                to_update.append((current.id, probability))
+
+    if to_create:
+        summary["items_created"] = await prisma.dictionaryitem.create_many(data=list(to_create.values()), skip_duplicates=True)
+    if to_update:
+        async with prisma.batch_() as batcher:
+            for item_id, probability in to_update:
+                batcher.dictionaryitem.update(where={"id": item_id}, data={"probability": probability})
+        summary["items_updated"] = len(to_update)
+    return summary
+
+async def load_dictionaries_from_file(file_path: str) -> Dict[str, int]:
     try:
         with open(file_path, 'r') as f:
             data = json.load(f)  # Assumes JSON format: {"type_name": [{"value": "val", "probability": float}, ...]}
-        
-        for type_name in DICT_TYPES:
-            type_data = await prisma.dictionarytype.find_unique(where={"name": type_name})
-            if not type_data:
-                type_data = await prisma.dictionarytype.create(data={"name": type_name})
-            
-            items = data.get(type_name, [])
-            for item in items:
-                existing = await prisma.dictionaryitem.find_first(
-                    where={"type_id": type_data.id, "value": item["value"]}
-                )
-                if not existing:
-                    await prisma.dictionaryitem.create(
-                        data={
-                            "type_id": type_data.id,
-                            "value": item["value"],
-                            "probability": item.get("probability")
-                        }
-                    )
+        return await sync_dictionaries(data)
     except Exception as e:
-        raise Exception(f"Failed to load dictionaries: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to load dictionaries: {str(e)}")
@@ -0,0 +1,20 @@
+import hashlib
+import json
+from typing import Any
+from fastapi import Request, Response
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    # Weak comparison: W/"x" and "x" name the same representation
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or any(c in (etag, bare) or c == f"W/{bare}" for c in candidates)
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
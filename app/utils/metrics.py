@@ -0,0 +1,113 @@
+import math
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from app.utils.constants import LATENCY_BUCKETS, QUERY_COUNT_BUCKETS
+
+# In-process request and database metrics, rendered in the Prometheus text
+# format. Every worker process keeps its own registry, so scrape each worker
+# (or run a single one) to get complete numbers.
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+class RequestStats:
+    # Prisma calls made while serving one request
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.breakdown: Dict[str, List[float]] = {}  # "Model.method" -> [count, seconds]
+
+    def record(self, name: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        entry = self.breakdown.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def summary(self) -> str:
+        ordered = sorted(self.breakdown.items(), key=lambda item: item[1][1], reverse=True)
+        return ", ".join(f"{name} x{count} {seconds * 1000:.1f}ms" for name, (count, seconds) in ordered)
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+class MetricsRegistry:
+    def __init__(self):
+        self.in_progress = 0
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.request_queries: Dict[Tuple[str, str], Histogram] = {}
+        self.request_db_time: Dict[Tuple[str, str], Histogram] = {}
+        self.queries: Dict[str, List[float]] = {}  # "Model.method" -> [count, seconds]
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+        self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+        self.request_queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+        self.request_db_time.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(stats.db_seconds)
+
+    def observe_query(self, name: str, seconds: float):
+        entry = self.queries.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_progress Requests currently being served.",
+            "# TYPE http_requests_in_progress gauge",
+            f"http_requests_in_progress {self.in_progress}",
+            "# HELP http_requests_total Completed requests.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        _render_histograms(lines, "http_request_duration_seconds", "Request latency.", self.latency)
+        _render_histograms(lines, "http_request_db_queries", "Prisma queries per request.", self.request_queries)
+        _render_histograms(lines, "http_request_db_seconds", "Time spent in Prisma per request.", self.request_db_time)
+        lines += [
+            "# HELP db_queries_total Prisma queries by model and method.",
+            "# TYPE db_queries_total counter",
+        ]
+        for name, (count, _) in sorted(self.queries.items()):
+            lines.append(f"db_queries_total{_labels(query=name)} {count}")
+        lines += [
+            "# HELP db_query_seconds_total Time spent in Prisma queries by model and method.",
+            "# TYPE db_query_seconds_total counter",
+        ]
+        for name, (_, seconds) in sorted(self.queries.items()):
+            lines.append(f"db_query_seconds_total{_labels(query=name)} {seconds:.6f}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _render_histograms(lines: List[str], name: str, help_text: str, histograms: Dict[Tuple[str, str], Histogram]):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == math.inf else repr(float(bound))
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=le)} {cumulative}")
+        labels = _labels(method=method, route=route)
+        lines.append(f"{name}_sum{labels} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{labels} {histogram.count}")
+
+metrics = MetricsRegistry()
@@ -0,0 +1,39 @@
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, List, Type
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+# Rows coming from Prisma are already typed by the database schema, so list
+# endpoints copy the model's fields straight into JSON bytes instead of
+# building Pydantic models and letting FastAPI validate and encode them again.
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def rows_to_dicts(rows: Iterable[Any], model: Type[BaseModel]) -> List[dict]:
+    fields = list(model.__fields__)
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+def json_rows(rows: Iterable[Any], model: Type[BaseModel], **kwargs) -> FastJSONResponse:
+    return FastJSONResponse(rows_to_dicts(rows, model), **kwargs)
@@ -0,0 +1,199 @@
+"""Drive the API's hot paths at fixed concurrency and record a JSON baseline.
+
+The app runs in-process behind httpx's ASGI transport against the database
+in DATABASE_URL (seed it first with benchmarks.seed). Every Prisma call is
+counted, so each scenario also reports queries per request. Scenarios run
+one after another, so query counts are exact per scenario.
+
+    python -m benchmarks.run --requests 200 --concurrency 16 --output baseline.json
+    python -m benchmarks.run --compare baseline.json --output current.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional
+import httpx
+from app.database.prisma import prisma
+from app.main import app, startup, shutdown
+from benchmarks.seed import BENCH_PASSWORD, BENCH_USERNAME, items_by_type
+
+REPORT_QUERY = {
+    "fields": ["id", "org_name", "project_name", "manager", "probability", "revenues.sum(amount)", "costs.sum(amount)"],
+    "filters": {},
+}
+EXPORT_QUERY = {
+    "fields": ["id", "org_name", "project_name", "manager", "stage_id", "revenues.sum(amount).by_year"],
+    "filters": {"manager": "manager1"},
+}
+
+class QueryCounter:
+    # Wraps the query engine shared by the client and its transaction copies,
+    # so every Prisma round-trip is counted
+    def __init__(self):
+        self.count = 0
+
+    def install(self):
+        engine = prisma._engine
+        original = engine.query
+
+        async def counted(*args, **kwargs):
+            self.count += 1
+            return await original(*args, **kwargs)
+
+        engine.query = counted
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+def build_scenarios(project_ids: List[int], revenues: List[Dict], costs: List[Dict], items: Dict, rng: random.Random) -> Dict[str, Callable]:
+    def pick() -> int:
+        return rng.choice(project_ids)
+
+    def pick_id(type_name: str) -> int:
+        return rng.choice(items[type_name]).id
+
+    def revenue_body() -> Dict:
+        return {
+            "year": 2025, "month": rng.randint(1, 12), "amount": round(rng.uniform(10_000, 500_000), 2),
+            "status_id": pick_id("revenue_status"),
+        }
+
+    def cost_body() -> Dict:
+        return {
+            "year": 2025, "month": rng.randint(1, 12), "amount": round(rng.uniform(5_000, 200_000), 2),
+            "cost_type_id": pick_id("cost_type"), "status_id": pick_id("cost_status"),
+        }
+
+    def update_revenue(c):
+        row = rng.choice(revenues)
+        return c.put(f"/projects/{row['project_id']}/revenues/{row['id']}", json={"amount": round(rng.uniform(10_000, 500_000), 2)})
+
+    def update_cost(c):
+        row = rng.choice(costs)
+        return c.put(f"/projects/{row['project_id']}/costs/{row['id']}", json={"amount": round(rng.uniform(5_000, 200_000), 2)})
+
+    return {
+        "dashboard": lambda c: c.get("/dashboard/"),
+        "gantt": lambda c: c.get(f"/dashboard/gantt/{pick()}"),
+        "gantt_batch": lambda c: c.post("/dashboard/gantt", json={"project_ids": rng.sample(project_ids, min(100, len(project_ids)))}),
+        "report": lambda c: c.post("/reports/", json=REPORT_QUERY),
+        "export_excel": lambda c: c.post("/reports/export/excel", json=EXPORT_QUERY),
+        "export_pdf": lambda c: c.post("/reports/export/pdf", json=EXPORT_QUERY),
+        "projects_list": lambda c: c.get("/projects/", params={"limit": 50}),
+        "projects_list_filtered": lambda c: c.get("/projects/", params={"limit": 50, "manager": "manager2", "order_by": "updated_at"}),
+        "revenues_list": lambda c: c.get(f"/projects/{pick()}/revenues/"),
+        "dictionary_items": lambda c: c.get("/dictionaries/items"),
+        "project_update": lambda c: c.put(f"/projects/{pick()}", json={"status": f"bench {rng.random():.6f}"}),
+        "revenue_create": lambda c: c.post(f"/projects/{pick()}/revenues/", json=revenue_body()),
+        "revenue_update": update_revenue,
+        "cost_create": lambda c: c.post(f"/projects/{pick()}/costs/", json=cost_body()),
+        "cost_update": update_cost,
+    }
+
+async def run_scenario(client: httpx.AsyncClient, send: Callable, requests: int, concurrency: int, counter: QueryCounter) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await send(client)
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "queries_per_request": round((counter.count - queries_before) / len(latencies), 2),
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline: Dict, current: Dict):
+    print(f"{'scenario':<24}{'rps':>18}{'p50 ms':>20}{'p99 ms':>20}{'queries/req':>18}")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        cells = []
+        for key in ("throughput_rps", "p50_ms", "p99_ms", "queries_per_request"):
+            old, new = before[key], result[key]
+            change = f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+            cells.append(f"{old:>8}->{new:<8}{change:>5}")
+        print(f"{name:<24}" + "".join(f"{c:>20}" for c in cells))
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", help="comma-separated subset to run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to diff against")
+    args = parser.parse_args()
+
+    await startup()
+    counter = QueryCounter()
+    counter.install()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            token = await client.post("/auth/token", data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+            token.raise_for_status()
+            client.headers["Authorization"] = f"Bearer {token.json()['access_token']}"
+
+            project_ids = [r["id"] for r in await prisma.query_raw('SELECT "id" FROM "Project"')]
+            if not project_ids:
+                raise SystemExit("No projects found, run benchmarks.seed first")
+            revenues = await prisma.query_raw('SELECT "id", "project_id" FROM "Revenue"')
+            costs = await prisma.query_raw('SELECT "id", "project_id" FROM "Cost"')
+            if not revenues or not costs:
+                raise SystemExit("No revenues or costs found, run benchmarks.seed first")
+            scenarios = build_scenarios(project_ids, revenues, costs, await items_by_type(), random.Random(args.seed))
+            selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+
+            results = {}
+            for name in selected:
+                results[name] = await run_scenario(client, scenarios[name], args.requests, args.concurrency, counter)
+                print(f"{name:<24}{json.dumps(results[name])}")
+    finally:
+        await shutdown()
+
+    output = {
+        "commit": _git_commit(),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {"requests": args.requests, "concurrency": args.concurrency, "projects": len(project_ids)},
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+
+if __name__ == "__main__":
+    asyncio.run(main())
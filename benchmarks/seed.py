@@ -0,0 +1,171 @@
+"""Seed a local Postgres with a synthetic portfolio for benchmarks.
+
+Uses DATABASE_URL like the app itself; the schema must already be pushed.
+
+    python -m benchmarks.seed --projects 5000 --months 24 --reset
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+from app.database.prisma import prisma
+from app.database.sql import insert_returning
+from app.services.auth_service import get_password_hash
+from app.services.stage_analytics import backfill_stage_transitions
+from app.utils.dictionary_loader import sync_dictionaries
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench"
+INSERT_CHUNK = 5000
+
+# Values for every type in DICT_TYPES; stages are ordered along the pipeline
+DICTIONARIES = {
+    "service": ["Интернет", "IP-телефония", "ЦОД", "Видеонаблюдение", "Облачные сервисы"],
+    "payment_type": ["Разовый", "Ежемесячный", "Ежеквартальный"],
+    "stage": [
+        ("Лид", 0.1), ("Квалификация", 0.25), ("Предложение", 0.5),
+        ("Переговоры", 0.75), ("Контракт", 0.9), ("Реализация", 1.0),
+    ],
+    "business_segment": ["B2B", "B2G", "Крупный бизнес", "МСБ"],
+    "revenue_status": ["План", "Факт"],
+    "cost_type": ["Оборудование", "Работы", "Лицензии"],
+    "cost_status": ["План", "Факт"],
+    "assessment": ["Высокая", "Средняя", "Низкая"],
+}
+
+def _dictionary_data():
+    data = {}
+    for type_name, values in DICTIONARIES.items():
+        data[type_name] = [
+            {"value": v[0], "probability": v[1]} if isinstance(v, tuple) else {"value": v}
+            for v in values
+        ]
+    return data
+
+async def items_by_type():
+    types = {t.id: t.name for t in await prisma.dictionarytype.find_many()}
+    items = {}
+    for item in await prisma.dictionaryitem.find_many(order={"id": "asc"}):
+        items.setdefault(types[item.type_id], []).append(item)
+    return items
+
+async def _create_many(delegate, rows):
+    for i in range(0, len(rows), INSERT_CHUNK):
+        await delegate.create_many(data=rows[i:i + INSERT_CHUNK])
+
+async def _insert_projects(rows):
+    # Returns the new ids in the order of rows; org_inn is unique per seeded row
+    ids = {}
+    for i in range(0, len(rows), INSERT_CHUNK):
+        inserted = await insert_returning(
+            prisma, "Project", rows[i:i + INSERT_CHUNK], ["id", "org_inn"], {"updated_at": "now()"}
+        )
+        ids.update((r["org_inn"], r["id"]) for r in inserted)
+    return [ids[r["org_inn"]] for r in rows]
+
+async def reset():
+    await prisma.execute_raw(
+        'TRUNCATE "SyncChange", "StageTransition", "ChangeHistory", "Revenue", "Cost", "Project" RESTART IDENTITY CASCADE'
+    )
+
+async def seed(projects: int, months: int, managers: int, seed_value: int):
+    rng = random.Random(seed_value)
+    await sync_dictionaries(_dictionary_data())
+    items = await items_by_type()
+    stages = sorted(
+        (i for i in items["stage"] if i.probability is not None),
+        key=lambda i: i.probability
+    )
+
+    user = await prisma.user.find_unique(where={"username": BENCH_USERNAME})
+    if not user:
+        user = await prisma.user.create(data={
+            "username": BENCH_USERNAME,
+            "password": await get_password_hash(BENCH_PASSWORD),
+            "role": "ADMIN",
+        })
+
+    now = datetime.utcnow()
+    plans = []
+    rows = []
+    for i in range(projects):
+        # Walk the pipeline from the first stage, spending 3-60 days in each
+        path = stages[:rng.randint(1, len(stages))]
+        created_at = now - timedelta(days=rng.randint(30, 720))
+        entered = []
+        at = created_at
+        for stage in path[1:]:
+            at += timedelta(days=rng.uniform(3, 60), hours=rng.randint(0, 23))
+            entered.append((stage, min(at, now)))
+        current = path[-1]
+        plans.append((path, entered, created_at))
+        rows.append({
+            "org_name": f"ООО Бенчмарк {i}",
+            "org_inn": f"{7700000000 + i}",
+            "project_name": f"Проект {i}",
+            "service_id": rng.choice(items["service"]).id,
+            "payment_type_id": rng.choice(items["payment_type"]).id,
+            "stage_id": current.id,
+            "probability": current.probability,
+            "manager": f"manager{rng.randrange(managers)}",
+            "business_segment_id": rng.choice(items["business_segment"]).id,
+            "created_at": created_at,
+        })
+    new_ids = await _insert_projects(rows)
+
+    history, revenues, costs = [], [], []
+    start_year = now.year - months // 12
+    for project_id, (path, entered, created_at) in zip(new_ids, plans):
+        history.append({
+            "project_id": project_id, "user_id": user.id, "field": "created",
+            "old_value": "", "new_value": str(project_id), "changed_at": created_at,
+        })
+        previous = path[0]
+        for stage, changed_at in entered:
+            history.append({
+                "project_id": project_id, "user_id": user.id, "field": "stage_id",
+                "old_value": str(previous.id), "new_value": str(stage.id), "changed_at": changed_at,
+            })
+            previous = stage
+        for m in range(months):
+            year, month = start_year + m // 12, m % 12 + 1
+            revenues.append({
+                "project_id": project_id, "year": year, "month": month,
+                "amount": round(rng.uniform(10_000, 500_000), 2),
+                "status_id": rng.choice(items["revenue_status"]).id,
+            })
+            if rng.random() < 0.5:
+                costs.append({
+                    "project_id": project_id, "year": year, "month": month,
+                    "amount": round(rng.uniform(5_000, 200_000), 2),
+                    "cost_type_id": rng.choice(items["cost_type"]).id,
+                    "status_id": rng.choice(items["cost_status"]).id,
+                })
+    await _create_many(prisma.changehistory, history)
+    await _create_many(prisma.revenue, revenues)
+    await _create_many(prisma.cost, costs)
+    await backfill_stage_transitions()
+    print(
+        f"seeded {projects} projects, {len(history)} history rows, "
+        f"{len(revenues)} revenues, {len(costs)} costs"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--managers", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="truncate projects and their history first")
+    args = parser.parse_args()
+
+    await prisma.connect()
+    try:
+        if args.reset:
+            await reset()
+        await seed(args.projects, args.months, args.managers, args.seed)
+    finally:
+        await prisma.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""Per-row cost of serializing Project rows for list endpoints.
+
+Compares the old path (build Project models from the row, let FastAPI
+validate them against response_model and encode them with the stdlib json
+encoder) with app.utils.serialization.
+
+    python -m benchmarks.serialization_bench --rows 5000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from app.models.project import Project
+from app.utils.serialization import json_rows, orjson
+
+def make_rows(n: int) -> List[SimpleNamespace]:
+    now = datetime.now(timezone.utc)
+    return [
+        SimpleNamespace(
+            id=i, org_name=f"ООО Организация {i}", org_inn=f"{7700000000 + i}",
+            project_name=f"Проект {i}", service_id=1, payment_type_id=2, stage_id=3,
+            probability=0.5, manager=f"manager{i % 40}", business_segment_id=4,
+            realization_year=now, industry_solution=bool(i % 2), forecast_accepted=False,
+            via_dzo=False, needs_leadership_control=False, assessment_id=None,
+            industry_manager=None, project_number=None, created_at=now, updated_at=now,
+            status="В работе", done_in_period=None, plans_next_period=None,
+        )
+        for i in range(n)
+    ]
+
+def old_path(rows) -> bytes:
+    models = [Project(**r.__dict__) for r in rows]
+    validated = [Project(**m.__dict__) for m in models]  # response_model validation
+    return json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+def new_path(rows) -> bytes:
+    return json_rows(rows, Project).body
+
+def bench(fn, rows, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    old = bench(old_path, rows, args.repeat)
+    new = bench(new_path, rows, args.repeat)
+    print(f"encoder: {'orjson' if orjson else 'json'}, rows: {args.rows}")
+    print(f"before: {old / args.rows * 1e6:8.2f} us/row")
+    print(f"after:  {new / args.rows * 1e6:8.2f} us/row  ({old / new:.1f}x)")
+
+if __name__ == "__main__":
+    main()